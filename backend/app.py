@@ -1,7 +1,44 @@
+import os
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import orjson
+from utils.request_body import MAX_REQUEST_BYTES
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    基于 orjson 的 JSON 序列化
+    
+    可直接序列化 numpy 数组和标量（如检测结果的布尔数组），无需先转换为 Python 列表
+    """
+    
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode()
+    
+    def response(self, *args, **kwargs):
+        """
+        生成 JSON 响应
+        
+        orjson 输出的 bytes 直接作为响应体，省去 dumps 中 decode 为 str
+        再由 Response 重新编码为 UTF-8 的两次完整复制（大数组响应时明显）
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.OPTIONS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# 限制请求体大小，超大请求在读取前即被拒绝
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 CORS(app)  # 允许跨域请求
 
 # 注册蓝图
@@ -50,5 +87,43 @@ def post_data():
         'received_data': data
     }), 201
 
+def run_production_server():
+    """
+    使用 gunicorn 多进程多线程运行服务
+    
+    Werkzeug 开发服务器只适合调试，大数据量的检测请求会在其上排队
+    
+    环境变量:
+        WEB_CONCURRENCY: 工作进程数，默认为 CPU 核数
+        GUNICORN_TIMEOUT: 单个请求的超时秒数，默认 120；
+            LOF、Matrix Profile、NormA 等大数据量检测耗时较长，gunicorn 默认的 30 秒不够
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    workers = os.environ.get('WEB_CONCURRENCY', str(os.cpu_count() or 1))
+    timeout = os.environ.get('GUNICORN_TIMEOUT', '120')
+    # 告知各工作进程进程总数，检测算法内部的线程池据此缩减，避免 CPU 被过度占用
+    os.environ['ANOMALY_WORKER_PROCESSES'] = workers
+    try:
+        os.execvp('gunicorn', [
+            'gunicorn',
+            '-w', workers,
+            '-k', 'gthread',
+            '--threads', '4',
+            '--timeout', timeout,
+            '-b', '0.0.0.0:5555',
+            '--chdir', backend_dir,
+            'app:app'
+        ])
+    except FileNotFoundError:
+        # 未安装 gunicorn（如 Windows 环境）时退回内置服务器
+        print("警告: 未找到 gunicorn，使用 Flask 内置服务器运行")
+        os.environ.pop('ANOMALY_WORKER_PROCESSES', None)
+        app.run(host='0.0.0.0', port=5555, threaded=True)
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5555, debug=True)
+    # FLASK_DEBUG=1 时使用调试模式（自动重载），否则使用生产服务器
+    if os.environ.get('FLASK_DEBUG') == '1':
+        app.run(host='0.0.0.0', port=5555, debug=True)
+    else:
+        run_production_server()
@@ -4,7 +4,7 @@ DBSCAN异常检测方法
 适用于检测数据中孤立的异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
@@ -20,8 +20,34 @@ class DBSCANDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'dbscan': {
+            'name': 'DBSCAN 检测',
+            'category': '距离型',
+            'description': '基于密度的空间聚类算法。将密度较低区域的点识别为噪声（异常），适用于检测孤立的离群点。',
+            'principle': '根据数据点的密度进行聚类。核心思想是：高密度区域形成聚类，低密度区域的点（无法达到min_samples个邻居的点）被标记为噪声点，即异常。eps参数定义邻域半径，min_samples定义核心点的最小邻居数。',
+            'params': {
+                'eps': {
+                    'type': 'float',
+                    'default': 0.5,
+                    'step': 0.1,
+                    'description': '邻域半径',
+                    'detail': '定义点的邻域范围（以标准差为单位）。较小的eps会产生更多的噪声点（异常），较大的eps会将更多点聚为一类。建议从0.5开始，根据数据分布调整。'
+                },
+                'min_samples': {
+                    'type': 'int',
+                    'default': 5,
+                    'step': 1,
+                    'description': '最小样本数',
+                    'detail': '成为核心点所需的最小邻居数（包括自己）。较大的值会产生更多噪声点（异常），较小的值会形成更密集的聚类。建议设置为数据集大小的1-2%。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], eps: float = 0.5, min_samples: int = 5) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], eps: float = 0.5, min_samples: int = 5) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用DBSCAN方法检测异常
         
@@ -31,18 +57,20 @@ class DBSCANDetection:
             min_samples: 核心点的最小邻居数
             
         Returns:
-            (异常标记列表, 统计信息字典)
+            (异常标记数组（布尔型）, 统计信息字典)
         """
         # 数据清洗
         cleaned_values, valid_mask, valid_indices = clean_data(values)
+        # 标准化和邻域查询使用 float32 即可
+        cleaned_values = cleaned_values.astype(np.float32)
         
         # 统计信息
         total_points = len(values)
-        valid_points = np.sum(valid_mask)
+        valid_points = np.count_nonzero(valid_mask)
         invalid_points = total_points - valid_points
         
         # 初始化异常标记
-        anomalies = [False] * total_points
+        anomalies = np.zeros(total_points, dtype=bool)
         
         # 如果有效数据点不足，返回空结果
         if valid_points < min_samples:
@@ -55,9 +83,8 @@ class DBSCANDetection:
             }
             return anomalies, stats
         
-        # 提取有效数据及其索引
-        valid_indices = np.where(valid_mask)[0]
-        valid_values = cleaned_values[valid_mask].reshape(-1, 1)
+        # 有效数据及其索引（clean_data 返回的已是有效数据和索引数组）
+        valid_values = cleaned_values
         
         # 标准化数据以便设置合适的eps
         mean_val = np.mean(valid_values)
@@ -70,59 +97,47 @@ class DBSCANDetection:
         # 调整eps到标准化空间
         adjusted_eps = eps
         
-        # DBSCAN核心算法
-        n = len(normalized_values)
-        labels = np.full(n, -1)  # -1表示噪声点（异常）
-        cluster_id = 0
-        visited = np.zeros(n, dtype=bool)
-        
-        def get_neighbors(point_idx):
-            """获取点的邻居"""
-            distances = np.abs(normalized_values - normalized_values[point_idx]).flatten()
-            return np.where(distances <= adjusted_eps)[0]
-        
-        def expand_cluster(point_idx, neighbors, cluster_id):
-            """扩展聚类"""
-            labels[point_idx] = cluster_id
-            i = 0
-            while i < len(neighbors):
-                neighbor_idx = neighbors[i]
-                
-                if not visited[neighbor_idx]:
-                    visited[neighbor_idx] = True
-                    neighbor_neighbors = get_neighbors(neighbor_idx)
-                    
-                    if len(neighbor_neighbors) >= min_samples:
-                        neighbors = np.concatenate([neighbors, neighbor_neighbors])
-                
-                if labels[neighbor_idx] == -1:
-                    labels[neighbor_idx] = cluster_id
-                
-                i += 1
-        
-        # 执行DBSCAN
-        for i in range(n):
-            if visited[i]:
-                continue
-            
-            visited[i] = True
-            neighbors = get_neighbors(i)
-            
-            if len(neighbors) >= min_samples:
-                expand_cluster(i, neighbors, cluster_id)
-                cluster_id += 1
+        # 一维数据排序后，每个点的eps邻域是排序数组中的一段连续区间 [lo, hi)
+        order = np.argsort(normalized_values, kind='stable')
+        sorted_vals = normalized_values[order]
+        n = len(sorted_vals)
+        # 上下界查询复用同一块缓冲区，避免额外分配临时数组
+        bounds = np.empty_like(sorted_vals)
+        lo = np.searchsorted(sorted_vals, np.subtract(sorted_vals, adjusted_eps, out=bounds), 'left')
+        hi = np.searchsorted(sorted_vals, np.add(sorted_vals, adjusted_eps, out=bounds), 'right')
+        
+        # 核心点：邻域内（包括自身）至少有 min_samples 个点
+        core_positions = np.flatnonzero(hi - lo >= min_samples)
+        
+        # DBSCAN核心算法（在排序后的索引空间中进行）
+        # 一维情况下无需逐点扩展：相邻的两个核心点互为邻居时属于同一聚类，
+        # 非核心点的邻域内若存在核心点则为边界点，否则为噪声点
+        sorted_labels = np.full(n, -1)  # -1表示噪声点（异常）
+        if len(core_positions) > 0:
+            core_cluster = np.concatenate([
+                [0],
+                np.cumsum(core_positions[1:] >= hi[core_positions[:-1]])
+            ])
+            # 每个点邻域内的第一个核心点
+            first_core = np.searchsorted(core_positions, lo, 'left')
+            has_core = first_core < len(core_positions)
+            has_core[has_core] = core_positions[first_core[has_core]] < hi[has_core]
+            sorted_labels[has_core] = core_cluster[first_core[has_core]]
+        
+        # 将标签映射回原始顺序
+        labels = np.empty(n, dtype=sorted_labels.dtype)
+        labels[order] = sorted_labels
         
         # 标记异常（噪声点）
-        anomaly_count = 0
-        for i, label in enumerate(labels):
-            if label == -1:
-                original_idx = valid_indices[i]
-                anomalies[original_idx] = True
-                anomaly_count += 1
+        noise_mask = labels == -1
+        anomalies[valid_indices[noise_mask]] = True
+        anomaly_count = int(np.count_nonzero(noise_mask))
         
         # 统计聚类信息
-        unique_clusters = len(set(labels)) - (1 if -1 in labels else 0)
-        noise_points = np.sum(labels == -1)
+        # 标签整体加1后统计，counts[0] 为噪声点数量
+        counts = np.bincount(labels + 1, minlength=1)
+        noise_points = counts[0]
+        unique_clusters = np.count_nonzero(counts[1:])
         
         # 统计信息
         stats = {
@@ -147,27 +162,4 @@ class DBSCANDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'dbscan': {
-                'name': 'DBSCAN 检测',
-                'category': '距离型',
-                'description': '基于密度的空间聚类算法。将密度较低区域的点识别为噪声（异常），适用于检测孤立的离群点。',
-                'principle': '根据数据点的密度进行聚类。核心思想是：高密度区域形成聚类，低密度区域的点（无法达到min_samples个邻居的点）被标记为噪声点，即异常。eps参数定义邻域半径，min_samples定义核心点的最小邻居数。',
-                'params': {
-                    'eps': {
-                        'type': 'float',
-                        'default': 0.5,
-                        'step': 0.1,
-                        'description': '邻域半径',
-                        'detail': '定义点的邻域范围（以标准差为单位）。较小的eps会产生更多的噪声点（异常），较大的eps会将更多点聚为一类。建议从0.5开始，根据数据分布调整。'
-                    },
-                    'min_samples': {
-                        'type': 'int',
-                        'default': 5,
-                        'step': 1,
-                        'description': '最小样本数',
-                        'detail': '成为核心点所需的最小邻居数（包括自己）。较大的值会产生更多噪声点（异常），较小的值会形成更密集的聚类。建议设置为数据集大小的1-2%。'
-                    }
-                }
-            }
-        }
+        return DBSCANDetection._METHOD_INFO
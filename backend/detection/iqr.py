@@ -3,7 +3,7 @@ IQR (Interquartile Range) 异常检测方法
 基于四分位距，识别超出 [Q1 - k*IQR, Q3 + k*IQR] 范围的异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
@@ -19,8 +19,27 @@ class IQRDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'iqr': {
+            'name': 'IQR 检测',
+            'category': '统计型',
+            'description': '基于四分位距的稳健统计方法，不受极端值影响。通过计算数据的四分位数来确定异常边界，适用于非正态分布的数据。',
+            'principle': '计算第一四分位数(Q1)、第三四分位数(Q3)和四分位距(IQR=Q3-Q1)，将超出[Q1-k×IQR, Q3+k×IQR]范围的点标记为异常。箱线图的经典方法。',
+            'params': {
+                'iqr_multiplier': {
+                    'type': 'float',
+                    'default': 1.5,
+                    'step': 0.1,
+                    'description': 'IQR 倍数',
+                    'detail': 'IQR的倍数系数。1.5为标准值（识别离群值），3.0识别极端离群值。值越大检测越保守。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], iqr_multiplier: float = 1.5) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], iqr_multiplier: float = 1.5) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用 IQR 方法检测异常
         
@@ -32,19 +51,21 @@ class IQRDetection:
             iqr_multiplier: IQR 倍数（默认1.5，常用值：1.5为离群值，3.0为极端离群值）
             
         Returns:
-            Tuple[List[bool], Dict[str, Any]]: 
-                - 异常标记列表（True 表示异常）
+            Tuple[np.ndarray, Dict[str, Any]]: 
+                - 异常标记数组（布尔型，True 表示异常）
                 - 统计信息字典
         """
-        if not values or len(values) == 0:
-            return [], {}
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool), {}
         
         # 数据清洗，移除NaN和Inf（由统一的数据清洗模块处理）
         valid_data, valid_mask, valid_indices = clean_data(values)
+        # 以 float32 计算分位数和边界比较，内存访问量减半
+        valid_data = valid_data.astype(np.float32)
         
         # 如果没有有效数据（理论上不应该发生，因为routes层已验证）
         if len(valid_data) == 0:
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'q1': 0.0,
                 'q2': 0.0,
                 'q3': 0.0,
@@ -59,9 +80,8 @@ class IQRDetection:
             }
         
         # 计算四分位数（仅使用有效数据）
-        q1 = float(np.percentile(valid_data, 25))
-        q2 = float(np.percentile(valid_data, 50))  # 中位数
-        q3 = float(np.percentile(valid_data, 75))
+        # 一次调用同时计算 Q1、中位数、Q3，只需对数据做一次划分
+        q1, q2, q3 = (float(q) for q in np.quantile(valid_data, [0.25, 0.5, 0.75], method='linear'))
         
         # 计算四分位距 (IQR)
         iqr = q3 - q1
@@ -73,10 +93,9 @@ class IQRDetection:
         # 检测异常（仅在有效数据中检测）
         valid_anomalies = (valid_data < lower_bound) | (valid_data > upper_bound)
         
-        # 将异常结果映射回原始索引（转换为Python bool以便JSON序列化）
-        anomalies = [False] * len(values)
-        for i, valid_idx in enumerate(valid_indices):
-            anomalies[valid_idx] = bool(valid_anomalies[i])
+        # 将异常结果映射回原始索引
+        anomalies = np.zeros(len(values), dtype=bool)
+        anomalies[valid_indices] = valid_anomalies
         
         # 统计信息
         stats = {
@@ -89,8 +108,8 @@ class IQRDetection:
             'total_points': len(values),
             'valid_points': len(valid_data),
             'invalid_points': len(values) - len(valid_data),
-            'anomaly_count': int(np.sum(valid_anomalies)),
-            'anomaly_ratio': float(np.sum(valid_anomalies) / len(valid_data))
+            'anomaly_count': int(np.count_nonzero(valid_anomalies)),
+            'anomaly_ratio': float(np.count_nonzero(valid_anomalies) / len(valid_data))
         }
         
         return anomalies, stats
@@ -103,20 +122,4 @@ class IQRDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'iqr': {
-                'name': 'IQR 检测',
-                'category': '统计型',
-                'description': '基于四分位距的稳健统计方法，不受极端值影响。通过计算数据的四分位数来确定异常边界，适用于非正态分布的数据。',
-                'principle': '计算第一四分位数(Q1)、第三四分位数(Q3)和四分位距(IQR=Q3-Q1)，将超出[Q1-k×IQR, Q3+k×IQR]范围的点标记为异常。箱线图的经典方法。',
-                'params': {
-                    'iqr_multiplier': {
-                        'type': 'float',
-                        'default': 1.5,
-                        'step': 0.1,
-                        'description': 'IQR 倍数',
-                        'detail': 'IQR的倍数系数。1.5为标准值（识别离群值），3.0识别极端离群值。值越大检测越保守。'
-                    }
-                }
-            }
-        }
+        return IQRDetection._METHOD_INFO
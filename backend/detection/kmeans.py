@@ -4,7 +4,7 @@ K-Means异常检测方法
 距离较远的点被视为异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
@@ -20,8 +20,41 @@ class KMeansDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'kmeans': {
+            'name': 'K-Means 检测',
+            'category': '距离型',
+            'description': '基于聚类的异常检测方法。先将数据聚为K个簇，然后识别距离簇中心较远的点为异常。适用于数据呈现明显聚类结构的场景。',
+            'principle': '使用K-Means算法将数据分为K个簇，计算每个点到最近簇中心的距离。距离最大的contamination比例的点被标记为异常，表示它们偏离正常模式。',
+            'params': {
+                'n_clusters': {
+                    'type': 'int',
+                    'default': 3,
+                    'step': 1,
+                    'description': '聚类数量',
+                    'detail': '将数据分为几个簇。建议根据数据特征选择：先尝试2-5个，观察效果后调整。聚类数过多可能导致过拟合。'
+                },
+                'contamination': {
+                    'type': 'float',
+                    'default': 0.1,
+                    'step': 0.01,
+                    'description': '异常数据比例',
+                    'detail': '预期的异常点占总数据的比例。距离簇中心最远的contamination比例的点被标记为异常。'
+                },
+                'max_iter': {
+                    'type': 'int',
+                    'default': 100,
+                    'step': 10,
+                    'description': '最大迭代次数',
+                    'detail': 'K-Means算法的最大迭代次数。通常100次足够收敛，数据量大时可适当增加。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], n_clusters: int = 3, contamination: float = 0.1, max_iter: int = 100) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], n_clusters: int = 3, contamination: float = 0.1, max_iter: int = 100) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用 K-Means 方法检测异常
         
@@ -35,19 +68,21 @@ class KMeansDetection:
             max_iter: 最大迭代次数，默认为 100
             
         Returns:
-            Tuple[List[bool], Dict[str, Any]]: 
-                - 异常标记列表（True 表示异常）
+            Tuple[np.ndarray, Dict[str, Any]]: 
+                - 异常标记数组（布尔型，True 表示异常）
                 - 统计信息字典
         """
-        if not values or len(values) == 0:
-            return [], {}
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool), {}
         
         # 数据清洗，移除NaN和Inf（由统一的数据清洗模块处理）
         valid_data, valid_mask, valid_indices = clean_data(values)
+        # 聚类过程使用 float32，距离统计在输出时转换为 Python float
+        valid_data = valid_data.astype(np.float32)
         
         # 如果没有有效数据
         if len(valid_data) == 0:
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': 0,
                 'invalid_points': len(values),
@@ -62,7 +97,7 @@ class KMeansDetection:
         actual_k = min(n_clusters, len(valid_data))
         if actual_k < 1:
             # 数据点太少
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': len(valid_data),
                 'invalid_points': len(values) - len(valid_data),
@@ -75,75 +110,74 @@ class KMeansDetection:
             }
         
         # 将1维数据转换为2维（索引作为特征）
-        X = np.column_stack([np.arange(len(valid_data)), valid_data])
+        X = np.column_stack([np.arange(len(valid_data), dtype=np.float32), valid_data])
         
-        # 标准化数据
-        X_normalized = (X - X.mean(axis=0)) / (X.std(axis=0) + 1e-10)
+        # 标准化数据：X 是新建的数组，原地中心化后直接复用来计算标准差，
+        # 省去 std() 内部再求一次均值和做一次减法
+        X -= X.mean(axis=0)
+        X /= np.sqrt(np.mean(X * X, axis=0)) + 1e-10
+        X_normalized = X
         
         # K-Means 聚类
         # 初始化聚类中心（使用K-Means++策略）
         n_points = len(X_normalized)
         centers = [X_normalized[np.random.randint(0, n_points)]]
         
+        # 每个点到已选中心的最小平方距离，每选出一个新中心后增量更新
+        min_sq_dist = np.full(n_points, np.inf, dtype=X_normalized.dtype)
+        
         for _ in range(actual_k - 1):
-            # 计算每个点到最近中心的距离
-            distances = np.array([min([np.sum((x - c)**2) for c in centers]) for x in X_normalized])
+            np.minimum(min_sq_dist, np.sum((X_normalized - centers[-1])**2, axis=1), out=min_sq_dist)
             # 按距离的平方作为概率选择下一个中心
-            probabilities = distances / distances.sum()
-            cumulative_probs = np.cumsum(probabilities)
+            cumulative_dist = np.cumsum(min_sq_dist)
             r = np.random.random()
-            for idx, prob in enumerate(cumulative_probs):
-                if r < prob:
-                    centers.append(X_normalized[idx])
-                    break
+            idx = np.searchsorted(cumulative_dist, r * cumulative_dist[-1], side='right')
+            centers.append(X_normalized[min(idx, n_points - 1)])
         
         centers = np.array(centers)
         
         # 迭代优化聚类中心
         for iteration in range(max_iter):
             # 分配每个点到最近的聚类中心
-            labels = np.zeros(n_points, dtype=int)
-            for i, point in enumerate(X_normalized):
-                distances_to_centers = np.sqrt(np.sum((centers - point)**2, axis=1))
-                labels[i] = np.argmin(distances_to_centers)
+            sq_distances_to_centers = np.sum((X_normalized[:, None, :] - centers[None, :, :])**2, axis=2)
+            labels = np.argmin(sq_distances_to_centers, axis=1)
+            min_sq_distances = sq_distances_to_centers[np.arange(n_points), labels]
             
-            # 更新聚类中心
-            new_centers = np.zeros_like(centers)
-            for k in range(actual_k):
-                cluster_points = X_normalized[labels == k]
-                if len(cluster_points) > 0:
-                    new_centers[k] = cluster_points.mean(axis=0)
-                else:
-                    # 如果某个聚类没有点，保持原中心
-                    new_centers[k] = centers[k]
+            # 更新聚类中心（按簇累加坐标后求均值）
+            counts = np.bincount(labels, minlength=actual_k)
+            sums = np.column_stack([
+                np.bincount(labels, weights=X_normalized[:, d], minlength=actual_k)
+                for d in range(X_normalized.shape[1])
+            ])
+            # 如果某个聚类没有点，保持原中心
+            new_centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers).astype(X_normalized.dtype)
             
             # 检查收敛
             if np.allclose(centers, new_centers, rtol=1e-6):
                 break
             
             centers = new_centers
+        else:
+            # 达到最大迭代次数仍未收敛时，中心在最后一次分配后已更新，需重新计算距离
+            min_sq_distances = np.min(np.sum((X_normalized[:, None, :] - centers[None, :, :])**2, axis=2), axis=1)
         
-        # 计算每个点到最近聚类中心的距离
-        distances_to_cluster = np.zeros(n_points)
-        for i, point in enumerate(X_normalized):
-            distances_to_centers = np.sqrt(np.sum((centers - point)**2, axis=1))
-            distances_to_cluster[i] = np.min(distances_to_centers)
+        # 每个点到最近聚类中心的距离（复用最后一次分配步骤的结果）
+        distances_to_cluster = np.sqrt(min_sq_distances)
         
         # 根据contamination参数确定阈值
         # 距离最大的 contamination 比例的点被标记为异常
         threshold_idx = int(len(distances_to_cluster) * (1 - contamination))
-        threshold_distance = np.sort(distances_to_cluster)[threshold_idx] if threshold_idx < len(distances_to_cluster) else distances_to_cluster.max()
+        threshold_distance = np.partition(distances_to_cluster, threshold_idx)[threshold_idx] if threshold_idx < len(distances_to_cluster) else distances_to_cluster.max()
         
         # 检测异常
         valid_anomalies = distances_to_cluster > threshold_distance
         
         # 将结果映射回原始数据
-        anomalies = [False] * len(values)
-        for i, idx in enumerate(valid_indices):
-            anomalies[idx] = bool(valid_anomalies[i])
+        anomalies = np.zeros(len(values), dtype=bool)
+        anomalies[valid_indices] = valid_anomalies
         
         # 统计每个聚类的大小
-        cluster_sizes = [np.sum(labels == k) for k in range(actual_k)]
+        cluster_sizes = np.bincount(labels, minlength=actual_k)
         
         # 统计信息（包含前端需要的标准字段）
         stats = {
@@ -151,8 +185,8 @@ class KMeansDetection:
             'total_points': len(values),
             'valid_points': len(valid_data),
             'invalid_points': len(values) - len(valid_data),
-            'anomaly_count': int(np.sum(valid_anomalies)),
-            'anomaly_ratio': float(np.sum(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
+            'anomaly_count': int(np.count_nonzero(valid_anomalies)),
+            'anomaly_ratio': float(np.count_nonzero(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
             # K-Means 特定字段
             'n_clusters': actual_k,
             'contamination': contamination,
@@ -161,7 +195,7 @@ class KMeansDetection:
             'mean_distance': float(np.mean(distances_to_cluster)),
             'max_distance': float(np.max(distances_to_cluster)),
             'min_distance': float(np.min(distances_to_cluster)),
-            'cluster_sizes': [int(size) for size in cluster_sizes]
+            'cluster_sizes': cluster_sizes.tolist()
         }
         
         return anomalies, stats
@@ -174,34 +208,4 @@ class KMeansDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'kmeans': {
-                'name': 'K-Means 检测',
-                'category': '距离型',
-                'description': '基于聚类的异常检测方法。先将数据聚为K个簇，然后识别距离簇中心较远的点为异常。适用于数据呈现明显聚类结构的场景。',
-                'principle': '使用K-Means算法将数据分为K个簇，计算每个点到最近簇中心的距离。距离最大的contamination比例的点被标记为异常，表示它们偏离正常模式。',
-                'params': {
-                    'n_clusters': {
-                        'type': 'int',
-                        'default': 3,
-                        'step': 1,
-                        'description': '聚类数量',
-                        'detail': '将数据分为几个簇。建议根据数据特征选择：先尝试2-5个，观察效果后调整。聚类数过多可能导致过拟合。'
-                    },
-                    'contamination': {
-                        'type': 'float',
-                        'default': 0.1,
-                        'step': 0.01,
-                        'description': '异常数据比例',
-                        'detail': '预期的异常点占总数据的比例。距离簇中心最远的contamination比例的点被标记为异常。'
-                    },
-                    'max_iter': {
-                        'type': 'int',
-                        'default': 100,
-                        'step': 10,
-                        'description': '最大迭代次数',
-                        'detail': 'K-Means算法的最大迭代次数。通常100次足够收敛，数据量大时可适当增加。'
-                    }
-                }
-            }
-        }
+        return KMeansDetection._METHOD_INFO
@@ -4,7 +4,8 @@ KNN异常检测方法
 距离较大的点被视为异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from scipy.spatial import cKDTree
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
@@ -20,8 +21,48 @@ class KNNDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 有效数据点数不少于该值时使用KD树查找近邻，否则使用矩阵乘法
+    KDTREE_MIN_POINTS = 1024
+    
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'knn': {
+            'name': 'KNN 检测',
+            'category': '距离型',
+            'description': '基于K近邻的局部异常检测方法。通过计算每个点到其K个最近邻的平均距离来度量异常性，距离大的点被视为异常。',
+            'principle': '对每个数据点，找到其K个最近邻，计算到这些邻居的平均距离。距离最大的contamination比例的点被标记为异常。适合检测局部稀疏区域的异常点。',
+            'params': {
+                'n_neighbors': {
+                    'type': 'int',
+                    'default': 5,
+                    'step': 1,
+                    'description': 'K近邻数量',
+                    'detail': '用于计算距离的邻居数量。值越大算法越稳定但计算量越大。小数据集建议5-10，大数据集建议20-50。'
+                },
+                'contamination': {
+                    'type': 'float',
+                    'default': 0.1,
+                    'step': 0.01,
+                    'description': '异常数据比例',
+                    'detail': '预期的异常点占总数据的比例。0.1表示预期10%的数据是异常。该值决定异常判定的阈值。'
+                },
+                'use_time_index': {
+                    'type': 'select',
+                    'default': True,
+                    'options': [
+                        {'label': '时间索引 + 数值', 'value': True},
+                        {'label': '仅数值', 'value': False}
+                    ],
+                    'description': '距离特征',
+                    'detail': '时间索引 + 数值：按 (索引, 数值) 二维距离查找近邻，时间上相邻的点更容易成为邻居；仅数值：只按数值大小查找近邻，计算更快，适合检测全局数值离群点。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], n_neighbors: int = 5, contamination: float = 0.1) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], n_neighbors: int = 5, contamination: float = 0.1,
+               use_time_index: bool = True) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用 KNN 方法检测异常
         
@@ -32,21 +73,23 @@ class KNNDetection:
             values: 时间序列数据（应已通过验证）
             n_neighbors: K近邻的数量，默认为 5
             contamination: 异常数据比例阈值（0-0.5），默认为 0.1
+            use_time_index: 是否把时间索引作为第二维特征，默认为 True；
+                为 False 时只按数值距离查找近邻
             
         Returns:
-            Tuple[List[bool], Dict[str, Any]]: 
-                - 异常标记列表（True 表示异常）
+            Tuple[np.ndarray, Dict[str, Any]]: 
+                - 异常标记数组（布尔型，True 表示异常）
                 - 统计信息字典
         """
-        if not values or len(values) == 0:
-            return [], {}
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool), {}
         
         # 数据清洗，移除NaN和Inf（由统一的数据清洗模块处理）
         valid_data, valid_mask, valid_indices = clean_data(values)
         
         # 如果没有有效数据
         if len(valid_data) == 0:
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': 0,
                 'invalid_points': len(values),
@@ -61,7 +104,7 @@ class KNNDetection:
         actual_k = min(n_neighbors, len(valid_data) - 1)
         if actual_k < 1:
             # 数据点太少，无法进行KNN检测
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': len(valid_data),
                 'invalid_points': len(values) - len(valid_data),
@@ -73,38 +116,48 @@ class KNNDetection:
                 'warning': '数据点太少，无法进行KNN检测'
             }
         
-        # 将1维数据转换为2维（索引作为特征）
-        # 对于时间序列，我们使用 (index, value) 作为特征
-        X = np.column_stack([np.arange(len(valid_data)), valid_data])
-        
-        # 标准化数据
-        X_normalized = (X - X.mean(axis=0)) / (X.std(axis=0) + 1e-10)
-        
-        # 计算每个点到其K个最近邻的平均距离
-        distances = []
-        for i in range(len(X_normalized)):
-            # 计算当前点到所有其他点的欧氏距离
-            point_distances = np.sqrt(np.sum((X_normalized - X_normalized[i])**2, axis=1))
-            # 排序并获取最近的K个邻居（排除自己）
-            k_nearest = np.sort(point_distances)[1:actual_k+1]
-            # 计算平均距离
-            avg_distance = np.mean(k_nearest)
-            distances.append(avg_distance)
-        
-        distances = np.array(distances)
+        if use_time_index:
+            # 将1维数据转换为2维（索引作为特征）
+            # 对于时间序列，我们使用 (index, value) 作为特征
+            X = np.column_stack([np.arange(len(valid_data)), valid_data])
+            
+            # 标准化数据：X 是新建的数组，原地中心化后直接复用来计算标准差，
+            # 省去 std() 内部再求一次均值和做一次减法
+            X -= X.mean(axis=0)
+            X /= np.sqrt(np.mean(X * X, axis=0)) + 1e-10
+            X_normalized = X
+            
+            # 计算每个点到其K个最近邻的平均距离
+            n_points = len(X_normalized)
+            if n_points >= KNNDetection.KDTREE_MIN_POINTS:
+                # 数据量较大时使用KD树查询，时间 O(n log n)，内存 O(n·k)
+                tree = cKDTree(X_normalized)
+                k_nearest, _ = tree.query(X_normalized, k=actual_k + 1)
+                # 第一列是点自身（距离为0），排除
+                distances = k_nearest[:, 1:].mean(axis=1)
+            else:
+                # 数据量较小时矩阵乘法更快：利用 ||a-b||² = ||a||² + ||b||² - 2a·b 一次算出平方距离矩阵
+                sq_norms = np.sum(X_normalized ** 2, axis=1)
+                sq_dist = sq_norms[:, None] + sq_norms[None, :] - 2 * (X_normalized @ X_normalized.T)
+                # 排除自身
+                np.fill_diagonal(sq_dist, np.inf)
+                # 只需最近的K个邻居，使用partition代替完整排序
+                k_nearest = np.partition(sq_dist, actual_k - 1, axis=1)[:, :actual_k]
+                distances = np.sqrt(np.maximum(k_nearest, 0)).mean(axis=1)
+        else:
+            distances = KNNDetection._sorted_knn_distances(valid_data, actual_k)
         
         # 根据contamination参数确定阈值
         # 距离最大的 contamination 比例的点被标记为异常
         threshold_idx = int(len(distances) * (1 - contamination))
-        threshold_distance = np.sort(distances)[threshold_idx] if threshold_idx < len(distances) else distances.max()
+        threshold_distance = np.partition(distances, threshold_idx)[threshold_idx] if threshold_idx < len(distances) else distances.max()
         
         # 检测异常
         valid_anomalies = distances > threshold_distance
         
         # 将结果映射回原始数据
-        anomalies = [False] * len(values)
-        for i, idx in enumerate(valid_indices):
-            anomalies[idx] = bool(valid_anomalies[i])
+        anomalies = np.zeros(len(values), dtype=bool)
+        anomalies[valid_indices] = valid_anomalies
         
         # 统计信息（包含前端需要的标准字段）
         stats = {
@@ -112,8 +165,8 @@ class KNNDetection:
             'total_points': len(values),
             'valid_points': len(valid_data),
             'invalid_points': len(values) - len(valid_data),
-            'anomaly_count': int(np.sum(valid_anomalies)),
-            'anomaly_ratio': float(np.sum(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
+            'anomaly_count': int(np.count_nonzero(valid_anomalies)),
+            'anomaly_ratio': float(np.count_nonzero(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
             # KNN 特定字段
             'n_neighbors': actual_k,
             'contamination': contamination,
@@ -125,6 +178,35 @@ class KNNDetection:
         
         return anomalies, stats
     
+    @staticmethod
+    def _sorted_knn_distances(valid_data: np.ndarray, k: int) -> np.ndarray:
+        """
+        一维数据的K近邻平均距离
+        
+        排序后每个点的K个最近邻一定落在排序位置 [i-k, i+k] 范围内，
+        因此只需比较 2k 个候选，时间 O(n log n + n·k)
+        """
+        # 与二维情况保持一致，先标准化
+        normalized = valid_data - valid_data.mean()
+        normalized /= np.sqrt(np.mean(normalized * normalized)) + 1e-10
+        
+        order = np.argsort(normalized, kind='stable')
+        sorted_data = normalized[order]
+        n = len(sorted_data)
+        
+        # 候选邻居：排序位置偏移 -k..-1 和 1..k，越界的位置距离记为无穷大
+        offsets = np.concatenate([np.arange(-k, 0), np.arange(1, k + 1)])
+        positions = np.arange(n)[:, None] + offsets[None, :]
+        in_range = (positions >= 0) & (positions < n)
+        candidates = np.abs(sorted_data[np.clip(positions, 0, n - 1)] - sorted_data[:, None])
+        candidates[~in_range] = np.inf
+        
+        k_nearest = np.partition(candidates, k - 1, axis=1)[:, :k]
+        
+        distances = np.empty(n, dtype=k_nearest.dtype)
+        distances[order] = k_nearest.mean(axis=1)
+        return distances
+    
     @staticmethod
     def get_method_info() -> Dict[str, Any]:
         """
@@ -133,27 +215,4 @@ class KNNDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'knn': {
-                'name': 'KNN 检测',
-                'category': '距离型',
-                'description': '基于K近邻的局部异常检测方法。通过计算每个点到其K个最近邻的平均距离来度量异常性，距离大的点被视为异常。',
-                'principle': '对每个数据点，找到其K个最近邻，计算到这些邻居的平均距离。距离最大的contamination比例的点被标记为异常。适合检测局部稀疏区域的异常点。',
-                'params': {
-                    'n_neighbors': {
-                        'type': 'int',
-                        'default': 5,
-                        'step': 1,
-                        'description': 'K近邻数量',
-                        'detail': '用于计算距离的邻居数量。值越大算法越稳定但计算量越大。小数据集建议5-10，大数据集建议20-50。'
-                    },
-                    'contamination': {
-                        'type': 'float',
-                        'default': 0.1,
-                        'step': 0.01,
-                        'description': '异常数据比例',
-                        'detail': '预期的异常点占总数据的比例。0.1表示预期10%的数据是异常。该值决定异常判定的阈值。'
-                    }
-                }
-            }
-        }
+        return KNNDetection._METHOD_INFO
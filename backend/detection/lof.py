@@ -4,13 +4,15 @@ LOF异常检测方法
 通过计算局部密度偏差来识别异常点，适用于发现局部密度明显低于邻域的异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from scipy.spatial import cKDTree
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_cleaner import clean_data
+from utils.data_cleaner import clean_data_inplace
+from utils.parallel import thread_budget
 
 
 class LOFDetection:
@@ -20,8 +22,34 @@ class LOFDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'lof': {
+            'name': 'LOF 检测',
+            'category': '距离型',
+            'description': '局部离群因子算法，通过比较点与邻域的密度来识别异常。能够识别不同密度区域中的局部异常，是最经典的密度异常检测方法之一。',
+            'principle': '计算每个点的局部可达密度(LRD)，再计算局部离群因子(LOF)，即该点LRD与其邻居LRD的比值。LOF>1表示该点比邻域稀疏（异常），值越大越异常。',
+            'params': {
+                'n_neighbors': {
+                    'type': 'int',
+                    'default': 20,
+                    'step': 1,
+                    'description': '邻居数量',
+                    'detail': '用于计算局部密度的邻居数量。建议设置较大值（20-30）以获得稳定结果。值太小会导致结果不稳定。'
+                },
+                'contamination': {
+                    'type': 'float',
+                    'default': 0.1,
+                    'step': 0.01,
+                    'description': '异常数据比例',
+                    'detail': '预期的异常点占总数据的比例。用于确定LOF阈值，LOF最大的contamination比例的点被标记为异常。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], n_neighbors: int = 20, contamination: float = 0.1) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], n_neighbors: int = 20, contamination: float = 0.1) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用 LOF 方法检测异常
         
@@ -34,19 +62,20 @@ class LOFDetection:
             contamination: 异常数据比例阈值（0-0.5），默认为 0.1
             
         Returns:
-            Tuple[List[bool], Dict[str, Any]]: 
-                - 异常标记列表（True 表示异常）
+            Tuple[np.ndarray, Dict[str, Any]]: 
+                - 异常标记数组（布尔型，True 表示异常）
                 - 统计信息字典
         """
-        if not values or len(values) == 0:
-            return [], {}
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool), {}
         
         # 数据清洗，移除NaN和Inf（由统一的数据清洗模块处理）
-        valid_data, valid_mask, valid_indices = clean_data(values)
+        data, valid_mask = clean_data_inplace(values)
+        valid_data = data[valid_mask]
         
         # 如果没有有效数据
         if len(valid_data) == 0:
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': 0,
                 'invalid_points': len(values),
@@ -61,7 +90,7 @@ class LOFDetection:
         actual_k = min(n_neighbors, len(valid_data) - 1)
         if actual_k < 1:
             # 数据点太少，无法进行LOF检测
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'total_points': len(values),
                 'valid_points': len(valid_data),
                 'invalid_points': len(values) - len(valid_data),
@@ -76,71 +105,41 @@ class LOFDetection:
         # 将1维数据转换为2维（索引作为特征）
         X = np.column_stack([np.arange(len(valid_data)), valid_data])
         
-        # 标准化数据
-        X_normalized = (X - X.mean(axis=0)) / (X.std(axis=0) + 1e-10)
+        # 标准化数据：X 是新建的数组，原地中心化后直接用于计算标准差，不再产生中间数组
+        X -= X.mean(axis=0)
+        X /= np.sqrt(np.mean(X * X, axis=0)) + 1e-10
+        X_normalized = X
         
-        # 计算所有点之间的距离矩阵
+        # 使用KD树查询K近邻，不再构造 n×n 距离矩阵，内存 O(n·k)
+        # 注意：与原实现一致，K近邻中包含点自身（距离为0）
         n_points = len(X_normalized)
-        distances_matrix = np.zeros((n_points, n_points))
-        for i in range(n_points):
-            for j in range(n_points):
-                if i != j:
-                    distances_matrix[i, j] = np.sqrt(np.sum((X_normalized[i] - X_normalized[j])**2))
-        
-        # 计算每个点的LOF值
-        lof_scores = []
-        for i in range(n_points):
-            # 获取K近邻的索引
-            distances_to_i = distances_matrix[i].copy()
-            k_nearest_indices = np.argpartition(distances_to_i, actual_k)[:actual_k]
-            
-            # 计算k-距离（到第k个最近邻的距离）
-            k_distance_i = distances_to_i[k_nearest_indices].max()
-            
-            # 计算可达距离密度（LRD）
-            reachability_distances = []
-            for j in k_nearest_indices:
-                distances_to_j = distances_matrix[j].copy()
-                k_distance_j = distances_to_j[np.argpartition(distances_to_j, actual_k)[:actual_k]].max()
-                reach_dist = max(distances_matrix[i, j], k_distance_j)
-                reachability_distances.append(reach_dist)
-            
-            lrd_i = 1.0 / (np.mean(reachability_distances) + 1e-10)
-            
-            # 计算邻居的LRD
-            neighbor_lrds = []
-            for j in k_nearest_indices:
-                distances_to_j = distances_matrix[j].copy()
-                k_nearest_j = np.argpartition(distances_to_j, actual_k)[:actual_k]
-                
-                reach_dists_j = []
-                for m in k_nearest_j:
-                    distances_to_m = distances_matrix[m].copy()
-                    k_distance_m = distances_to_m[np.argpartition(distances_to_m, actual_k)[:actual_k]].max()
-                    reach_dist_j = max(distances_matrix[j, m], k_distance_m)
-                    reach_dists_j.append(reach_dist_j)
-                
-                lrd_j = 1.0 / (np.mean(reach_dists_j) + 1e-10)
-                neighbor_lrds.append(lrd_j)
-            
-            # 计算LOF值
-            lof = np.mean(neighbor_lrds) / (lrd_i + 1e-10)
-            lof_scores.append(lof)
-        
-        lof_scores = np.array(lof_scores)
+        tree = cKDTree(X_normalized, leafsize=16, balanced_tree=True)
+        # 查询线程数按进程的线程预算确定，gunicorn 多进程下不会每个请求都占满所有核
+        neighbor_distances, k_nearest_indices = tree.query(X_normalized, k=actual_k, workers=thread_budget())
+        # k=1 时 query 返回一维数组，统一为 (n, k)
+        neighbor_distances = neighbor_distances.reshape(n_points, actual_k)
+        k_nearest_indices = k_nearest_indices.reshape(n_points, actual_k)
+        k_distances = neighbor_distances.max(axis=1)
+        
+        # 计算每个点的局部可达密度（LRD）
+        # 可达距离 reach_dist(i, j) = max(d(i, j), k_distance(j))
+        reachability_distances = np.maximum(neighbor_distances, k_distances[k_nearest_indices])
+        lrd = 1.0 / (reachability_distances.mean(axis=1) + 1e-10)
+        
+        # 计算LOF值：邻居LRD的均值与自身LRD之比
+        lof_scores = lrd[k_nearest_indices].mean(axis=1) / (lrd + 1e-10)
         
         # 根据contamination参数确定阈值
         # LOF值最大的 contamination 比例的点被标记为异常
         threshold_idx = int(len(lof_scores) * (1 - contamination))
-        threshold_lof = np.sort(lof_scores)[threshold_idx] if threshold_idx < len(lof_scores) else lof_scores.max()
+        threshold_lof = np.partition(lof_scores, threshold_idx)[threshold_idx] if threshold_idx < len(lof_scores) else lof_scores.max()
         
         # 检测异常（LOF > 1 表示比邻域密度低，值越大越异常）
         valid_anomalies = lof_scores > threshold_lof
         
         # 将结果映射回原始数据
-        anomalies = [False] * len(values)
-        for i, idx in enumerate(valid_indices):
-            anomalies[idx] = bool(valid_anomalies[i])
+        anomalies = np.zeros(len(values), dtype=bool)
+        anomalies[valid_mask] = valid_anomalies
         
         # 统计信息（包含前端需要的标准字段）
         stats = {
@@ -148,8 +147,8 @@ class LOFDetection:
             'total_points': len(values),
             'valid_points': len(valid_data),
             'invalid_points': len(values) - len(valid_data),
-            'anomaly_count': int(np.sum(valid_anomalies)),
-            'anomaly_ratio': float(np.sum(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
+            'anomaly_count': int(np.count_nonzero(valid_anomalies)),
+            'anomaly_ratio': float(np.count_nonzero(valid_anomalies) / len(valid_data)) if len(valid_data) > 0 else 0.0,
             # LOF 特定字段
             'n_neighbors': actual_k,
             'contamination': contamination,
@@ -169,27 +168,4 @@ class LOFDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'lof': {
-                'name': 'LOF 检测',
-                'category': '距离型',
-                'description': '局部离群因子算法，通过比较点与邻域的密度来识别异常。能够识别不同密度区域中的局部异常，是最经典的密度异常检测方法之一。',
-                'principle': '计算每个点的局部可达密度(LRD)，再计算局部离群因子(LOF)，即该点LRD与其邻居LRD的比值。LOF>1表示该点比邻域稀疏（异常），值越大越异常。',
-                'params': {
-                    'n_neighbors': {
-                        'type': 'int',
-                        'default': 20,
-                        'step': 1,
-                        'description': '邻居数量',
-                        'detail': '用于计算局部密度的邻居数量。建议设置较大值（20-30）以获得稳定结果。值太小会导致结果不稳定。'
-                    },
-                    'contamination': {
-                        'type': 'float',
-                        'default': 0.1,
-                        'step': 0.01,
-                        'description': '异常数据比例',
-                        'detail': '预期的异常点占总数据的比例。用于确定LOF阈值，LOF最大的contamination比例的点被标记为异常。'
-                    }
-                }
-            }
-        }
+        return LOFDetection._METHOD_INFO
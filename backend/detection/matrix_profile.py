@@ -4,13 +4,15 @@ Matrix Profile异常检测方法
 适用于检测时间序列中的异常子序列和不匹配模式
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_cleaner import clean_data
+from utils.data_cleaner import clean_data_inplace
+from utils.parallel import thread_budget
 
 
 class MatrixProfileDetection:
@@ -20,8 +22,41 @@ class MatrixProfileDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 子序列数不超过该值时用一次矩阵乘法计算全部距离，否则按行递推（STOMP）
+    GEMM_MAX_SUBSEQUENCES = 1024
+    # 子序列数不少于该值时按行分块并行计算
+    PARALLEL_MIN_SUBSEQUENCES = 4096
+    # 并行计算的最大线程数
+    MAX_WORKERS = 8
+    
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'matrix_profile': {
+            'name': 'Matrix Profile 检测',
+            'category': '距离型',
+            'description': '基于时间序列相似性的异常检测方法。通过计算每个子序列与其最近邻的距离来识别异常模式。适用于检测时间序列中的不匹配模式和异常子序列。',
+            'principle': '计算时间序列的Matrix Profile，即每个子序列到其最近邻（非重叠）子序列的距离。距离较大的子序列表示在整个时间序列中较为独特，可能是异常。距离最大的contamination比例的子序列被标记为异常。',
+            'params': {
+                'window_size': {
+                    'type': 'int',
+                    'default': 10,
+                    'step': 1,
+                    'description': '窗口大小',
+                    'detail': '子序列的长度。应该选择能够捕获异常模式特征的长度。窗口太小可能无法捕获完整模式，太大会降低灵敏度。建议从数据周期性的1/4到1/2开始尝试。'
+                },
+                'contamination': {
+                    'type': 'float',
+                    'default': 0.1,
+                    'step': 0.01,
+                    'description': '异常数据比例',
+                    'detail': '预期的异常数据占总数据的比例。Matrix Profile距离最大的contamination比例的子序列被标记为异常。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], window_size: int = 10, contamination: float = 0.1) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], window_size: int = 10, contamination: float = 0.1) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用Matrix Profile方法检测异常
         
@@ -31,18 +66,18 @@ class MatrixProfileDetection:
             contamination: 异常数据比例
             
         Returns:
-            (异常标记列表, 统计信息字典)
+            (异常标记数组, 统计信息字典)
         """
         # 数据清洗
-        cleaned_values, valid_mask, valid_indices = clean_data(values)
+        data, valid_mask = clean_data_inplace(values)
         
         # 统计信息
         total_points = len(values)
-        valid_points = np.sum(valid_mask)
+        valid_points = np.count_nonzero(valid_mask)
         invalid_points = total_points - valid_points
         
         # 初始化异常标记
-        anomalies = [False] * total_points
+        anomalies = np.zeros(total_points, dtype=bool)
         
         # 如果有效数据点不足，返回空结果
         if valid_points < window_size * 2:
@@ -56,34 +91,12 @@ class MatrixProfileDetection:
             return anomalies, stats
         
         # 提取有效数据
-        valid_values = cleaned_values[valid_mask]
+        valid_values = data[valid_mask]
         
         # 计算Matrix Profile
         n = len(valid_values)
         m = window_size
-        
-        # 初始化Matrix Profile数组
-        matrix_profile = np.full(n - m + 1, np.inf)
-        
-        # 计算每个子序列到其最近邻的距离
-        for i in range(n - m + 1):
-            query = valid_values[i:i + m]
-            min_dist = np.inf
-            
-            # 计算与其他子序列的距离（排除自身和邻近窗口）
-            for j in range(n - m + 1):
-                # 排除自身和重叠部分
-                if abs(i - j) < m // 4:
-                    continue
-                
-                candidate = valid_values[j:j + m]
-                # 计算欧氏距离
-                dist = np.sqrt(np.sum((query - candidate) ** 2))
-                
-                if dist < min_dist:
-                    min_dist = dist
-            
-            matrix_profile[i] = min_dist
+        matrix_profile = MatrixProfileDetection._compute_matrix_profile(valid_values, m, m // 4)
         
         # 标准化Matrix Profile
         mp_mean = np.mean(matrix_profile)
@@ -95,21 +108,17 @@ class MatrixProfileDetection:
         
         # 确定异常阈值
         threshold_idx = int((1 - contamination) * len(normalized_mp))
-        threshold = np.sort(normalized_mp)[threshold_idx] if threshold_idx < len(normalized_mp) else np.max(normalized_mp)
-        
-        # 标记异常
-        valid_indices = np.where(valid_mask)[0]
-        anomaly_count = 0
-        
-        for i, mp_value in enumerate(normalized_mp):
-            if mp_value > threshold:
-                # 将整个窗口标记为异常
-                start_idx = valid_indices[i] if i < len(valid_indices) else valid_indices[-1]
-                end_idx = min(start_idx + m, total_points)
-                for idx in range(start_idx, end_idx):
-                    if not anomalies[idx]:
-                        anomalies[idx] = True
-                        anomaly_count += 1
+        threshold = np.partition(normalized_mp, threshold_idx)[threshold_idx] if threshold_idx < len(normalized_mp) else np.max(normalized_mp)
+        
+        # 标记异常：每个异常子序列覆盖原始索引 [start, start + m)
+        # 在差分数组的起点 +1、终点 -1，前缀和大于0的位置即被至少一个异常窗口覆盖
+        anomalous_windows = np.flatnonzero(normalized_mp > threshold)
+        starts = np.flatnonzero(valid_mask)[anomalous_windows]
+        ends = np.minimum(starts + m, total_points)
+        coverage = (np.bincount(starts, minlength=total_points + 1)
+                    - np.bincount(ends, minlength=total_points + 1))
+        anomalies = np.cumsum(coverage[:total_points]) > 0
+        anomaly_count = int(np.count_nonzero(anomalies))
         
         # 统计信息
         stats = {
@@ -127,6 +136,106 @@ class MatrixProfileDetection:
         
         return anomalies, stats
     
+    @staticmethod
+    def _compute_matrix_profile(values: np.ndarray, m: int, exclusion: int) -> np.ndarray:
+        """
+        STOMP 方式计算 Matrix Profile（非标准化欧氏距离）
+        
+        子序列 i 与 j 的距离平方为 ||T_i||² + ||T_j||² - 2·QT[i, j]，
+        点积行 QT[i, :] 可由上一行在 O(n) 内递推得到：
+            QT[i, j] = QT[i-1, j-1] - T[i-1]·T[j-1] + T[i+m-1]·T[j+m-1]
+        总时间 O(n²)，内存 O(n)
+        
+        子序列较少时直接用一次矩阵乘法得到全部 QT，内存 O(n²) 但更快；
+        数据量较大时按行切分为若干块，由线程池并行计算（numpy 运算期间会释放 GIL），
+        每块从精确计算的首行点积开始递推，块之间互不依赖
+        
+        Args:
+            values: 有效数据
+            m: 子序列长度
+            exclusion: 排除区半径，|i - j| < exclusion 的子序列对不参与比较
+            
+        Returns:
+            每个子序列到最近邻子序列的距离
+        """
+        # 欧氏距离与平移无关，先去均值以减小点积相减时的舍入误差
+        x = np.asarray(values, dtype=np.float64)
+        x = x - x.mean()
+        n_subs = len(x) - m + 1
+        
+        windows = np.lib.stride_tricks.sliding_window_view(x, m)
+        sq_norms = np.einsum('ij,ij->i', windows, windows)
+        # 第一行点积，同时也是第一列（QT 对称），用于每行递推时补上 QT[i, 0]
+        first_column = windows @ windows[0]
+        
+        if n_subs <= MatrixProfileDetection.GEMM_MAX_SUBSEQUENCES:
+            # 子序列较少时一次矩阵乘法算出全部点积，BLAS 比逐行递推的 Python 循环更快
+            dist_sq = windows @ windows.T
+            dist_sq *= -2.0
+            dist_sq += sq_norms
+            dist_sq += sq_norms[:, None]
+            if exclusion > 0:
+                positions = np.arange(n_subs)
+                dist_sq[np.abs(positions[:, None] - positions[None, :]) < exclusion] = np.inf
+            else:
+                np.fill_diagonal(dist_sq, 0.0)
+            return np.sqrt(np.maximum(dist_sq.min(axis=1), 0))
+        
+        matrix_profile = np.empty(n_subs)
+        
+        # gunicorn 下 CPU 核数按工作进程数平分，避免各进程的线程池叠加后过度占用 CPU
+        n_workers = thread_budget(MatrixProfileDetection.MAX_WORKERS)
+        if n_subs < MatrixProfileDetection.PARALLEL_MIN_SUBSEQUENCES or n_workers <= 1:
+            MatrixProfileDetection._compute_profile_rows(
+                x, windows, sq_norms, first_column, m, exclusion, 0, n_subs, matrix_profile)
+        else:
+            # 块数多于线程数，使各线程负载更均衡
+            bounds = np.linspace(0, n_subs, n_workers * 4 + 1, dtype=int)
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(MatrixProfileDetection._compute_profile_rows,
+                                    x, windows, sq_norms, first_column, m, exclusion,
+                                    start, stop, matrix_profile)
+                    for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+                ]
+                for future in futures:
+                    future.result()
+        
+        return np.sqrt(np.maximum(matrix_profile, 0))
+    
+    @staticmethod
+    def _compute_profile_rows(x: np.ndarray, windows: np.ndarray, sq_norms: np.ndarray,
+                              first_column: np.ndarray, m: int, exclusion: int,
+                              start: int, stop: int, out: np.ndarray) -> None:
+        """
+        计算第 [start, stop) 行子序列的最近邻距离平方，写入 out[start:stop]
+        """
+        n_subs = len(sq_norms)
+        qt = windows @ windows[start]
+        prev_qt = np.empty_like(qt)
+        dist_sq = np.empty_like(qt)
+        term = np.empty(n_subs - 1)
+        
+        for i in range(start, stop):
+            if i > start:
+                qt, prev_qt = prev_qt, qt
+                np.multiply(x[:n_subs - 1], x[i - 1], out=term)
+                np.subtract(prev_qt[:-1], term, out=qt[1:])
+                np.multiply(x[m:m + n_subs - 1], x[i + m - 1], out=term)
+                qt[1:] += term
+                qt[0] = first_column[i]
+            
+            np.multiply(qt, -2.0, out=dist_sq)
+            dist_sq += sq_norms
+            dist_sq += sq_norms[i]
+            # 排除自身和重叠部分
+            if exclusion > 0:
+                dist_sq[max(0, i - exclusion + 1):min(n_subs, i + exclusion)] = np.inf
+            else:
+                # 不设排除区时自身距离恒为0，避免舍入误差开方后被放大
+                dist_sq[i] = 0.0
+            out[i] = dist_sq.min()
+    
     @staticmethod
     def get_method_info() -> Dict[str, Any]:
         """
@@ -135,27 +244,4 @@ class MatrixProfileDetection:
         Returns:
             方法配置字典
         """
-        return {
-            'matrix_profile': {
-                'name': 'Matrix Profile 检测',
-                'category': '距离型',
-                'description': '基于时间序列相似性的异常检测方法。通过计算每个子序列与其最近邻的距离来识别异常模式。适用于检测时间序列中的不匹配模式和异常子序列。',
-                'principle': '计算时间序列的Matrix Profile，即每个子序列到其最近邻（非重叠）子序列的距离。距离较大的子序列表示在整个时间序列中较为独特，可能是异常。距离最大的contamination比例的子序列被标记为异常。',
-                'params': {
-                    'window_size': {
-                        'type': 'int',
-                        'default': 10,
-                        'step': 1,
-                        'description': '窗口大小',
-                        'detail': '子序列的长度。应该选择能够捕获异常模式特征的长度。窗口太小可能无法捕获完整模式，太大会降低灵敏度。建议从数据周期性的1/4到1/2开始尝试。'
-                    },
-                    'contamination': {
-                        'type': 'float',
-                        'default': 0.1,
-                        'step': 0.01,
-                        'description': '异常数据比例',
-                        'detail': '预期的异常数据占总数据的比例。Matrix Profile距离最大的contamination比例的子序列被标记为异常。'
-                    }
-                }
-            }
-        }
+        return MatrixProfileDetection._METHOD_INFO
@@ -4,13 +4,13 @@ NormA异常检测方法
 适用于检测偏离正常分布的异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_cleaner import clean_data
+from utils.data_cleaner import clean_data_inplace
 
 
 class NormADetection:
@@ -20,8 +20,41 @@ class NormADetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'norma': {
+            'name': 'NormA 检测',
+            'category': '距离型',
+            'description': '基于归一化距离的异常检测方法。通过计算数据点与其局部邻域的归一化偏差来识别异常。结合Z-Score和MAD等多种统计量，适用于检测偏离局部正常模式的异常点。',
+            'principle': '对每个数据点，在其局部窗口内计算多种归一化距离度量（Z-Score和中位数绝对偏差MAD）。这些度量反映了数据点与局部正常模式的偏离程度。异常分数最高的contamination比例的点被标记为异常。sensitivity参数控制检测敏感度。',
+            'params': {
+                'window_size': {
+                    'type': 'int',
+                    'default': 10,
+                    'step': 1,
+                    'description': '窗口大小',
+                    'detail': '用于计算局部统计量的窗口大小。较小的窗口对局部异常更敏感，较大的窗口考虑更广的上下文。建议根据数据的局部变化特征选择。'
+                },
+                'contamination': {
+                    'type': 'float',
+                    'default': 0.1,
+                    'step': 0.01,
+                    'description': '异常数据比例',
+                    'detail': '预期的异常数据占总数据的比例。归一化距离最大的contamination比例的点被标记为异常。'
+                },
+                'sensitivity': {
+                    'type': 'float',
+                    'default': 1.0,
+                    'step': 0.1,
+                    'description': '敏感度',
+                    'detail': '控制异常检测的敏感程度。大于1会增加敏感度（检测出更多异常），小于1会降低敏感度（更保守）。建议从1.0开始调整。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], window_size: int = 10, contamination: float = 0.1, sensitivity: float = 1.0) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], window_size: int = 10, contamination: float = 0.1, sensitivity: float = 1.0) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用NormA方法检测异常
         
@@ -32,18 +65,19 @@ class NormADetection:
             sensitivity: 敏感度系数（越大越敏感）
             
         Returns:
-            (异常标记列表, 统计信息字典)
+            (异常标记数组, 统计信息字典)
         """
         # 数据清洗
-        cleaned_values, valid_mask, valid_indices = clean_data(values)
+        # 局部统计只需 float32 精度，窗口矩阵的内存和带宽减半
+        data, valid_mask = clean_data_inplace(values, dtype=np.float32)
         
         # 统计信息
         total_points = len(values)
-        valid_points = np.sum(valid_mask)
+        valid_points = np.count_nonzero(valid_mask)
         invalid_points = total_points - valid_points
         
         # 初始化异常标记
-        anomalies = [False] * total_points
+        anomalies = np.zeros(total_points, dtype=bool)
         
         # 如果有效数据点不足，返回空结果
         if valid_points < window_size:
@@ -56,64 +90,44 @@ class NormADetection:
             }
             return anomalies, stats
         
-        # 提取有效数据及其索引
-        valid_indices = np.where(valid_mask)[0]
-        valid_values = cleaned_values[valid_mask]
+        # 提取有效数据
+        valid_values = data[valid_mask]
         n = len(valid_values)
         
         # 计算局部归一化距离
         anomaly_scores = np.zeros(n)
+        half_window = window_size // 2
         
-        for i in range(n):
-            # 确定窗口范围
-            start = max(0, i - window_size // 2)
-            end = min(n, i + window_size // 2 + 1)
-            
-            # 提取局部窗口（排除当前点）
-            window_indices = list(range(start, i)) + list(range(i + 1, end))
-            if len(window_indices) == 0:
-                anomaly_scores[i] = 0
-                continue
+        if half_window > 0:
+            # 内部点的窗口完整（左右各 half_window 个点），一次性批量计算
+            if n > 2 * half_window:
+                # sliding_window_view 零拷贝得到以各点为中心、长度 2h+1 的窗口，
+                # 去掉中心列（当前点）后拼成 (点数, 2h) 的窗口矩阵
+                centered = np.lib.stride_tricks.sliding_window_view(valid_values, 2 * half_window + 1)
+                windows = np.concatenate((centered[:, :half_window], centered[:, half_window + 1:]), axis=1)
+                anomaly_scores[half_window:n - half_window] = NormADetection._window_scores(
+                    centered[:, half_window], windows, sensitivity)
             
-            window_data = valid_values[window_indices]
-            
-            # 计算局部统计量
-            local_mean = np.mean(window_data)
-            local_std = np.std(window_data)
-            local_median = np.median(window_data)
-            
-            # 计算归一化距离
-            if local_std > 0:
-                # 标准化偏差
-                z_score = abs(valid_values[i] - local_mean) / local_std
-                
-                # 中位数绝对偏差 (MAD)
-                mad = np.median(np.abs(window_data - local_median))
-                if mad > 0:
-                    mad_score = abs(valid_values[i] - local_median) / mad
-                else:
-                    mad_score = 0
-                
-                # 结合多种度量
-                anomaly_scores[i] = (z_score + mad_score) / 2 * sensitivity
-            else:
-                # 如果局部标准差为0，检查点是否与局部均值不同
-                if abs(valid_values[i] - local_mean) > 1e-10:
-                    anomaly_scores[i] = 10.0 * sensitivity
-                else:
-                    anomaly_scores[i] = 0
+            # 两端的点窗口被截断，长度各不相同，逐点计算
+            edge_points = np.concatenate([np.arange(min(half_window, n)),
+                                          np.arange(max(n - half_window, half_window), n)])
+            for i in edge_points:
+                start = max(0, i - half_window)
+                end = min(n, i + half_window + 1)
+                # 提取局部窗口（排除当前点），由左右两段连续切片拼接
+                window_data = np.concatenate((valid_values[start:i], valid_values[i + 1:end]))
+                if len(window_data) == 0:
+                    continue
+                anomaly_scores[i] = NormADetection._local_score(valid_values[i], window_data, sensitivity)
         
         # 确定阈值
         threshold_idx = int((1 - contamination) * len(anomaly_scores))
-        threshold = np.sort(anomaly_scores)[threshold_idx] if threshold_idx < len(anomaly_scores) else np.max(anomaly_scores)
+        threshold = np.partition(anomaly_scores, threshold_idx)[threshold_idx] if threshold_idx < len(anomaly_scores) else np.max(anomaly_scores)
         
         # 标记异常
-        anomaly_count = 0
-        for i, score in enumerate(anomaly_scores):
-            if score > threshold:
-                original_idx = valid_indices[i]
-                anomalies[original_idx] = True
-                anomaly_count += 1
+        valid_anomalies = anomaly_scores > threshold
+        anomalies[valid_mask] = valid_anomalies
+        anomaly_count = int(np.count_nonzero(valid_anomalies))
         
         # 统计信息
         stats = {
@@ -132,6 +146,69 @@ class NormADetection:
         
         return anomalies, stats
     
+    @staticmethod
+    def _local_score(value: float, window_data: np.ndarray, sensitivity: float) -> float:
+        """
+        计算单个点相对其局部窗口的归一化异常分数
+        
+        Args:
+            value: 当前点的值
+            window_data: 局部窗口数据（不含当前点）
+            sensitivity: 敏感度系数
+            
+        Returns:
+            异常分数
+        """
+        # 计算局部统计量
+        local_mean = np.mean(window_data)
+        local_std = np.std(window_data)
+        
+        # 如果局部标准差为0，检查点是否与局部均值不同
+        if local_std <= 0:
+            return 10.0 * sensitivity if abs(value - local_mean) > 1e-10 else 0.0
+        
+        # 标准化偏差
+        z_score = abs(value - local_mean) / local_std
+        
+        # 中位数绝对偏差 (MAD)
+        local_median = np.median(window_data)
+        mad = np.median(np.abs(window_data - local_median))
+        mad_score = abs(value - local_median) / mad if mad > 0 else 0
+        
+        # 结合多种度量
+        return (z_score + mad_score) / 2 * sensitivity
+    
+    @staticmethod
+    def _window_scores(points: np.ndarray, windows: np.ndarray, sensitivity: float) -> np.ndarray:
+        """
+        批量计算异常分数，与 _local_score 逐点计算的结果一致
+        
+        Args:
+            points: 各点的值，形状 (k,)
+            windows: 各点对应的局部窗口（不含该点），形状 (k, w)
+            sensitivity: 敏感度系数
+            
+        Returns:
+            各点的异常分数
+        """
+        local_mean = windows.mean(axis=1)
+        local_std = windows.std(axis=1)
+        local_median = np.median(windows, axis=1)
+        mad = np.median(np.abs(windows - local_median[:, None]), axis=1)
+        
+        mean_deviation = np.abs(points - local_mean)
+        median_deviation = np.abs(points - local_median)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = mean_deviation / local_std
+            mad_score = np.where(mad > 0, median_deviation / mad, 0.0)
+        
+        scores = (z_score + mad_score) / 2 * sensitivity
+        # 局部标准差为0时，只看点是否与局部均值不同
+        flat = local_std <= 0
+        scores[flat] = np.where(mean_deviation[flat] > 1e-10, 10.0 * sensitivity, 0.0)
+        return scores
+    
     @staticmethod
     def get_method_info() -> Dict[str, Any]:
         """
@@ -140,34 +217,4 @@ class NormADetection:
         Returns:
             方法配置字典
         """
-        return {
-            'norma': {
-                'name': 'NormA 检测',
-                'category': '距离型',
-                'description': '基于归一化距离的异常检测方法。通过计算数据点与其局部邻域的归一化偏差来识别异常。结合Z-Score和MAD等多种统计量，适用于检测偏离局部正常模式的异常点。',
-                'principle': '对每个数据点，在其局部窗口内计算多种归一化距离度量（Z-Score和中位数绝对偏差MAD）。这些度量反映了数据点与局部正常模式的偏离程度。异常分数最高的contamination比例的点被标记为异常。sensitivity参数控制检测敏感度。',
-                'params': {
-                    'window_size': {
-                        'type': 'int',
-                        'default': 10,
-                        'step': 1,
-                        'description': '窗口大小',
-                        'detail': '用于计算局部统计量的窗口大小。较小的窗口对局部异常更敏感，较大的窗口考虑更广的上下文。建议根据数据的局部变化特征选择。'
-                    },
-                    'contamination': {
-                        'type': 'float',
-                        'default': 0.1,
-                        'step': 0.01,
-                        'description': '异常数据比例',
-                        'detail': '预期的异常数据占总数据的比例。归一化距离最大的contamination比例的点被标记为异常。'
-                    },
-                    'sensitivity': {
-                        'type': 'float',
-                        'default': 1.0,
-                        'step': 0.1,
-                        'description': '敏感度',
-                        'detail': '控制异常检测的敏感程度。大于1会增加敏感度（检测出更多异常），小于1会降低敏感度（更保守）。建议从1.0开始调整。'
-                    }
-                }
-            }
-        }
+        return NormADetection._METHOD_INFO
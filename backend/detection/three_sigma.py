@@ -3,13 +3,13 @@
 基于正态分布假设，超出均值±3倍标准差的数据点被视为异常点
 """
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Union
 import sys
 import os
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_cleaner import clean_data
+from utils.data_cleaner import clean_data_inplace
 
 
 class ThreeSigmaDetection:
@@ -19,8 +19,27 @@ class ThreeSigmaDetection:
     注意：此类假设输入数据已经过验证（在routes层完成）
     """
     
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        '3sigma': {
+            'name': '3-Sigma 检测',
+            'category': '统计型',
+            'description': '基于正态分布假设的经典统计方法。计算数据的均值(μ)和标准差(σ)，将偏离均值超过 N×σ 的数据点标记为异常。适用于近似正态分布的数据。',
+            'principle': '假设数据服从正态分布，根据3σ原则，99.7%的数据应落在[μ-3σ, μ+3σ]区间内，超出此区间的数据点被视为异常。',
+            'params': {
+                'sigma_threshold': {
+                    'type': 'float',
+                    'default': 3.0,
+                    'step': 0.1,
+                    'description': 'Sigma 阈值（倍数）',
+                    'detail': '设置偏离均值的标准差倍数。3σ对应99.7%置信度，2σ对应95.4%，值越大检测越保守。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def detect(values: List[float], sigma_threshold: float = 3.0) -> Tuple[List[bool], Dict[str, Any]]:
+    def detect(values: Union[List[float], np.ndarray], sigma_threshold: float = 3.0) -> Tuple[np.ndarray, Dict[str, Any]]:
         """
         使用 3-Sigma 方法检测异常
         
@@ -32,19 +51,20 @@ class ThreeSigmaDetection:
             sigma_threshold: Sigma 阈值（倍数），默认为 3.0
             
         Returns:
-            Tuple[List[bool], Dict[str, Any]]: 
-                - 异常标记列表（True 表示异常）
+            Tuple[np.ndarray, Dict[str, Any]]: 
+                - 异常标记数组（布尔型，True 表示异常）
                 - 统计信息字典
         """
-        if not values or len(values) == 0:
-            return [], {}
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool), {}
         
-        # 数据清洗，移除NaN和Inf（由统一的数据清洗模块处理）
-        valid_data, valid_mask, valid_indices = clean_data(values)
+        # 只转换一次，有效值掩码直接在完整数组上计算
+        data, valid_mask = clean_data_inplace(values)
+        valid_data = data[valid_mask]
         
         # 如果没有有效数据（理论上不应该发生，因为routes层已验证）
         if len(valid_data) == 0:
-            return [False] * len(values), {
+            return np.zeros(len(values), dtype=bool), {
                 'mean': 0.0,
                 'std': 0.0,
                 'upper_bound': 0.0,
@@ -64,13 +84,10 @@ class ThreeSigmaDetection:
         upper_bound = mean + sigma_threshold * std
         lower_bound = mean - sigma_threshold * std
         
-        # 检测异常（仅在有效数据中检测）
-        valid_anomalies = (valid_data > upper_bound) | (valid_data < lower_bound)
-        
-        # 将异常结果映射回原始索引（转换为Python bool以便JSON序列化）
-        anomalies = [False] * len(values)
-        for i, valid_idx in enumerate(valid_indices):
-            anomalies[valid_idx] = bool(valid_anomalies[i])
+        # 直接在原始索引上检测异常，无效位置（已置为0）不标记为异常
+        anomalies = (data > upper_bound) | (data < lower_bound)
+        anomalies &= valid_mask
+        anomaly_count = int(np.count_nonzero(anomalies))
         
         # 统计信息
         stats = {
@@ -81,8 +98,8 @@ class ThreeSigmaDetection:
             'total_points': len(values),
             'valid_points': len(valid_data),
             'invalid_points': len(values) - len(valid_data),
-            'anomaly_count': int(np.sum(valid_anomalies)),
-            'anomaly_ratio': float(np.sum(valid_anomalies) / len(valid_data))
+            'anomaly_count': anomaly_count,
+            'anomaly_ratio': float(anomaly_count / len(valid_data))
         }
         
         return anomalies, stats
@@ -95,20 +112,4 @@ class ThreeSigmaDetection:
         Returns:
             方法配置字典
         """
-        return {
-            '3sigma': {
-                'name': '3-Sigma 检测',
-                'category': '统计型',
-                'description': '基于正态分布假设的经典统计方法。计算数据的均值(μ)和标准差(σ)，将偏离均值超过 N×σ 的数据点标记为异常。适用于近似正态分布的数据。',
-                'principle': '假设数据服从正态分布，根据3σ原则，99.7%的数据应落在[μ-3σ, μ+3σ]区间内，超出此区间的数据点被视为异常。',
-                'params': {
-                    'sigma_threshold': {
-                        'type': 'float',
-                        'default': 3.0,
-                        'step': 0.1,
-                        'description': 'Sigma 阈值（倍数）',
-                        'detail': '设置偏离均值的标准差倍数。3σ对应99.7%置信度，2σ对应95.4%，值越大检测越保守。'
-                    }
-                }
-            }
-        }
+        return ThreeSigmaDetection._METHOD_INFO
@@ -3,14 +3,17 @@
 支持多种平滑算法：移动平均、指数平滑、高斯平滑
 """
 
+from functools import lru_cache
 import numpy as np
-from typing import List, Dict, Any
+from scipy.ndimage import correlate1d
+from scipy.signal import choose_conv_method, convolve, lfilter, oaconvolve
+from typing import List, Dict, Any, Optional, Tuple, Union
 import sys
 import os
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_cleaner import clean_data
+from utils.data_cleaner import to_float_array, all_finite
 
 
 class DataSmoothing:
@@ -24,8 +27,40 @@ class DataSmoothing:
     
     SUPPORTED_METHODS = ['moving_average', 'exponential', 'gaussian']
     
+    # 线性的有限窗口滤波方法，连续多步可以组合为一次卷积
+    LINEAR_METHODS = ('moving_average', 'gaussian')
+    
+    # 方法配置信息，所有请求共用同一份（只读，调用方不应修改）
+    _METHOD_INFO = {
+        'smooth': {
+            'name': '数据平滑',
+            'description': '对时间序列数据进行平滑处理，减少噪声，提升数据质量',
+            'principle': '通过不同的权重策略对时间窗口内的数据点进行加权平均，消除短期波动，保留长期趋势。移动平均使用等权重，指数平滑赋予近期数据更高权重，高斯平滑使用正态分布权重。',
+            'params': {
+                'method': {
+                    'type': 'select',
+                    'default': 'moving_average',
+                    'options': [
+                        {'label': '移动平均', 'value': 'moving_average'},
+                        {'label': '指数平滑', 'value': 'exponential'},
+                        {'label': '高斯平滑', 'value': 'gaussian'}
+                    ],
+                    'description': '平滑算法',
+                    'detail': '移动平均（MA）：简单平均，适合平稳数据；指数平滑（EMA）：近期权重更高，适合趋势数据；高斯平滑：使用正态分布权重，平滑效果最好但计算较慢。'
+                },
+                'window_size': {
+                    'type': 'int',
+                    'default': 5,
+                    'description': '窗口大小',
+                    'detail': '平滑窗口的数据点数量。值越大平滑效果越强，但会损失更多细节。建议：噪声大用7-15，噪声小用3-7。指数平滑中，窗口大小影响衰减速度（alpha=2/(window+1））。'
+                }
+            }
+        }
+    }
+    
     @staticmethod
-    def apply(values: List[float], method: str = 'moving_average', window_size: int = 5) -> List[float]:
+    def apply(values: Union[List[float], np.ndarray], method: str = 'moving_average', window_size: int = 5,
+              dtype=np.float64, skip_validation: bool = False) -> np.ndarray:
         """
         应用平滑方法
         
@@ -36,48 +71,242 @@ class DataSmoothing:
             values: 输入数据值列表（应已通过验证）
             method: 平滑方法 ('moving_average', 'exponential', 'gaussian')
             window_size: 窗口大小
+            dtype: 计算使用的浮点类型，默认 float64；传入 np.float32 时内存带宽减半，
+                适合对精度要求不高的大数据量（前缀和等累加仍在 float64 中进行）
+            skip_validation: 调用方已将数据转换为浮点 numpy 数组、且之后不再使用该数组时传 True：
+                直接在该数组上插值清洗（不再复制），也不检查结果中的 NaN 和 Inf（由调用方检查）
             
         Returns:
-            平滑后的数据值列表
+            平滑后的数据数组（dtype 类型），由 orjson 直接序列化，无需转换为列表
         """
-        if not values or len(values) == 0:
-            return []
+        if len(values) == 0:
+            return np.zeros(0, dtype=dtype)
         
         if window_size < 1:
-            return values
+            if skip_validation:
+                return values.astype(dtype, copy=False)
+            return to_float_array(values).astype(dtype, copy=False)
         
         if method not in DataSmoothing.SUPPORTED_METHODS:
             raise ValueError(f"不支持的平滑方法: {method}. 支持的方法: {DataSmoothing.SUPPORTED_METHODS}")
         
-        # 使用统一的数据清洗模块（数据验证已在routes层完成）
-        valid_data, valid_mask, valid_indices = clean_data(values)
-        
+        data, has_valid = DataSmoothing._prepare_data(values, dtype, copy=not skip_validation)
         # 如果没有有效数据，返回原数据（理论上不应该发生，因为routes层已验证）
-        if len(valid_data) == 0:
-            return values
+        if not has_valid:
+            return data
         
-        # 转换为 numpy 数组
-        data = np.array(values, dtype=float)
+        result = DataSmoothing._smooth(data, method, window_size)
+        if skip_validation:
+            return result
         
-        # 使用线性插值填充无效值
-        if len(valid_data) < len(values):
-            data[~valid_mask] = np.interp(np.where(~valid_mask)[0], valid_indices, valid_data)
+        # 再次检查结果中是否有 NaN 或 Inf
+        if not all_finite(result):
+            print(f"警告: 平滑后的数据包含 NaN 或 Inf 值，使用原始数据")
+            # data 可能已被插值修改，重新转换原始数据
+            return to_float_array(values).astype(dtype, copy=False)
         
+        return result
+    
+    @staticmethod
+    def apply_chain(values: Union[List[float], np.ndarray], steps: List[Tuple[str, int, Any]],
+                    skip_validation: bool = False) -> np.ndarray:
+        """
+        按顺序应用多个平滑步骤，结果与依次调用 apply 一致
+        
+        移动平均和高斯平滑都是线性的有限窗口滤波，多次平滑等价于用各步骤的核
+        卷积组合成的单个核做一次卷积。所有步骤都属于这两种方法（且计算类型相同）时，
+        内部点通过一次卷积完成，只有两端窗口被截断的少量点按步骤逐个计算；
+        含有指数平滑等其他步骤时逐个调用 apply
+        
+        Args:
+            values: 输入数据值列表或数组（应已通过验证）
+            steps: 平滑步骤列表，每一步为 (method, window_size, dtype)
+            skip_validation: 含义同 apply
+            
+        Returns:
+            平滑后的数据数组
+        """
+        dtypes = {dtype for _, _, dtype in steps}
+        if (len(steps) < 2 or len(dtypes) > 1 or len(values) == 0
+                or any(method not in DataSmoothing.LINEAR_METHODS for method, _, _ in steps)):
+            return DataSmoothing._apply_sequentially(values, steps, skip_validation)
+        
+        dtype = dtypes.pop()
+        data, has_valid = DataSmoothing._prepare_data(values, dtype, copy=not skip_validation)
+        if not has_valid:
+            return data
+        
+        linear_steps = tuple((method, window_size) for method, window_size, _ in steps if window_size >= 1)
+        kernel = DataSmoothing._chain_kernel(linear_steps)
+        
+        # 组合核的半宽等于各步骤半宽之和：距两端不少于 half 的点，
+        # 每一步用到的窗口都完整，组合卷积的结果与逐步计算一致
+        half = len(kernel) // 2
+        n = len(data)
+        if half == 0:
+            return data
+        if n <= 4 * half:
+            return DataSmoothing._smooth_steps(data, linear_steps)
+        
+        result = np.empty(n, dtype=data.dtype)
+        # 核较短时直接卷积更快；核较长时用 FFT，此时核仍远短于数据，分段的重叠相加比整段 FFT 更快
+        if DataSmoothing._conv_method(1 << (n - 1).bit_length(), len(kernel)) == 'direct':
+            result[half:n - half] = convolve(data, kernel, mode='valid', method='direct')
+        else:
+            result[half:n - half] = oaconvolve(data, kernel, mode='valid')
+        # 两端各 half 个点的结果只依赖距端点 2 * half 以内的数据，在这两段上逐步计算
+        result[:half] = DataSmoothing._smooth_steps(data[:2 * half], linear_steps)[:half]
+        result[n - half:] = DataSmoothing._smooth_steps(data[n - 2 * half:], linear_steps)[half:]
+        
+        if not skip_validation and not all_finite(result):
+            # 与 apply 的逐步回退行为保持一致
+            return DataSmoothing._apply_sequentially(values, steps)
+        
+        return result
+    
+    @staticmethod
+    def _apply_sequentially(values: Union[List[float], np.ndarray], steps: List[Tuple[str, int, Any]],
+                            skip_validation: bool = False) -> np.ndarray:
+        """
+        依次调用 apply 应用每个平滑步骤
+        
+        skip_validation 为 True 时，中间结果都是新数组，各步骤都可以直接在上一步的结果上处理
+        """
+        result = values
+        for method, window_size, dtype in steps:
+            result = DataSmoothing.apply(result, method, window_size, dtype, skip_validation)
+        return result
+    
+    @staticmethod
+    def _prepare_data(values: Union[List[float], np.ndarray], dtype, copy: bool = True) -> Tuple[np.ndarray, bool]:
+        """
+        转换输入数据，并用线性插值填充其中的 NaN 和 Inf
+        
+        Args:
+            values: 输入数据值列表或数组
+            dtype: 转换的目标浮点类型
+            copy: 为 False 时 values 须为浮点 numpy 数组，类型相同时直接在其上插值，不再复制
+            
+        Returns:
+            (转换后的数组, 是否含有有效数据)；没有有效数据时数组保持原样
+        """
+        # 转换为 numpy 数组（只转换一次）
+        if copy:
+            data = to_float_array(values).astype(dtype, copy=False)
+        else:
+            data = values.astype(dtype, copy=False)
+        valid_mask, all_valid, first_valid_idx = DataSmoothing._inspect(data)
+        
+        # 数据全部有效时（常见情况）无需插值
+        if not all_valid:
+            if first_valid_idx < 0:
+                return data, False
+            
+            # 使用线性插值填充无效值
+            valid_indices = np.flatnonzero(valid_mask)
+            invalid_indices = np.flatnonzero(~valid_mask)
+            data[invalid_indices] = np.interp(invalid_indices, valid_indices, data[valid_indices])
+        
+        return data, True
+    
+    @staticmethod
+    def _smooth(data: np.ndarray, method: str, window_size: int) -> np.ndarray:
+        """
+        对已清洗的数据应用单个平滑方法
+        """
         if method == 'moving_average':
-            result = DataSmoothing._moving_average(data, window_size)
+            return DataSmoothing._moving_average(data, window_size)
         elif method == 'exponential':
-            result = DataSmoothing._exponential_smoothing(data, window_size)
+            return DataSmoothing._exponential_smoothing(data, window_size)
         elif method == 'gaussian':
-            result = DataSmoothing._gaussian_smoothing(data, window_size)
-        else:
-            result = data
+            return DataSmoothing._gaussian_smoothing(data, window_size)
+        return data
+    
+    @staticmethod
+    def _smooth_steps(data: np.ndarray, steps: List[Tuple[str, int]]) -> np.ndarray:
+        """
+        对已清洗的数据依次应用多个平滑方法
+        """
+        for method, window_size in steps:
+            data = DataSmoothing._smooth(data, method, window_size)
+        return data
+    
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _chain_kernel(steps: Tuple[Tuple[str, int], ...]) -> np.ndarray:
+        """
+        多个线性平滑步骤组合成的卷积核，按步骤序列缓存复用
         
-        # 再次检查结果中是否有 NaN 或 Inf
-        if np.any(np.isnan(result)) or np.any(np.isinf(result)):
-            print(f"警告: 平滑后的数据包含 NaN 或 Inf 值，使用原始数据")
-            return values
+        Args:
+            steps: 平滑步骤序列，每一步为 (method, window_size)
+            
+        Returns:
+            各步骤的核依次卷积得到的只读卷积核
+        """
+        kernel = np.array([1.0])
+        for method, window_size in steps:
+            kernel = np.convolve(kernel, DataSmoothing._linear_kernel(method, window_size))
+        # 缓存的核被所有请求共享，设为只读防止被意外修改
+        kernel.flags.writeable = False
+        return kernel
+    
+    @staticmethod
+    def _linear_kernel(method: str, window_size: int) -> np.ndarray:
+        """
+        线性平滑方法在内部点（窗口未被截断）上的卷积核
+        
+        Args:
+            method: 平滑方法 ('moving_average' 或 'gaussian')
+            window_size: 窗口大小
+            
+        Returns:
+            权重和为1的卷积核
+        """
+        if method == 'gaussian':
+            return DataSmoothing._gaussian_kernel(window_size)
+        
+        # 移动平均的窗口为当前点左右各 half_window 个点
+        width = 2 * (window_size // 2) + 1
+        return np.full(width, 1.0 / width)
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _conv_method(n_bucket: int, kernel_len: int) -> str:
+        """
+        选择直接卷积或 FFT 卷积，按 (数据长度所在的2的幂区间, 核长度) 缓存，
+        同类请求不必每次重新判断
+        
+        Args:
+            n_bucket: 数据长度向上取整到的2的幂
+            kernel_len: 卷积核长度
+            
+        Returns:
+            'direct' 或 'fft'
+        """
+        return choose_conv_method(np.empty(n_bucket), np.empty(kernel_len), mode='valid')
+    
+    @staticmethod
+    def _inspect(data: np.ndarray) -> Tuple[Optional[np.ndarray], bool, int]:
+        """
+        检查数据中的 NaN 和 Inf
+        
+        先由 all_finite 做无额外内存的快速检查，不全是有限值时再逐元素计算有效值掩码
+        
+        Args:
+            data: 输入数据
+            
+        Returns:
+            (有效值掩码, 是否全部有效, 第一个有效值的位置)
+            全部有效时掩码为 None；没有有效值时位置为 -1
+        """
+        if all_finite(data):
+            return None, True, 0
         
-        return result.tolist()
+        finite_mask = np.isfinite(data)
+        first_finite_idx = int(np.argmax(finite_mask))
+        if not finite_mask[first_finite_idx]:
+            return finite_mask, False, -1
+        return finite_mask, bool(finite_mask.all()), first_finite_idx
     
     @staticmethod
     def _moving_average(data: np.ndarray, window_size: int) -> np.ndarray:
@@ -92,14 +321,30 @@ class DataSmoothing:
             平滑后的数据
         """
         half_window = window_size // 2
-        result = np.zeros_like(data)
+        n = len(data)
         
-        for i in range(len(data)):
-            start = max(0, i - half_window)
-            end = min(len(data), i + half_window + 1)
-            result[i] = np.mean(data[start:end])
+        # 前缀和：窗口 [start, end) 的和为 csum[end] - csum[start]，O(n) 完成
+        # 直接写入预分配数组，省去 concatenate 的一次复制
+        # 累加始终在 float64 中进行，避免 float32 输入的前缀和在长序列上累积误差
+        csum = np.empty(n + 1)
+        csum[0] = 0.0
+        np.cumsum(data, dtype=np.float64, out=csum[1:])
         
-        return result
+        # 内部点的窗口完整，用前缀和的两个错位切片相减，不需要构造索引数组
+        width = 2 * half_window + 1
+        result = np.empty(n)
+        if n > 2 * half_window:
+            np.subtract(csum[width:], csum[:n - 2 * half_window], out=result[half_window:n - half_window])
+            result[half_window:n - half_window] /= width
+        
+        # 两端窗口被截断，只对实际落在数据范围内的点求平均
+        edge_points = np.concatenate([np.arange(min(half_window, n)),
+                                      np.arange(max(n - half_window, half_window), n)])
+        starts = np.maximum(edge_points - half_window, 0)
+        ends = np.minimum(edge_points + half_window + 1, n)
+        result[edge_points] = (csum[ends] - csum[starts]) / (ends - starts)
+        
+        return result.astype(data.dtype, copy=False)
     
     @staticmethod
     def _exponential_smoothing(data: np.ndarray, window_size: int) -> np.ndarray:
@@ -114,13 +359,13 @@ class DataSmoothing:
             平滑后的数据
         """
         alpha = 2.0 / (window_size + 1)
-        result = np.zeros_like(data)
-        result[0] = data[0]
         
-        for i in range(1, len(data)):
-            result[i] = alpha * data[i] + (1 - alpha) * result[i - 1]
+        # 递推 y[i] = alpha·x[i] + (1-alpha)·y[i-1] 即一阶 IIR 滤波器，由 lfilter 在 C 中完成；
+        # 初始状态取 (1-alpha)·x[0]，使 y[0] = x[0]
+        zi = np.array([(1 - alpha) * data[0]])
+        result, _ = lfilter([alpha], [1.0, -(1 - alpha)], data, zi=zi)
         
-        return result
+        return result.astype(data.dtype, copy=False)
     
     @staticmethod
     def _gaussian_smoothing(data: np.ndarray, window_size: int) -> np.ndarray:
@@ -135,21 +380,50 @@ class DataSmoothing:
             平滑后的数据
         """
         half_window = window_size // 2
-        sigma = window_size / 3.0
-        result = np.zeros_like(data)
+        # 窗口内只有当前点（window_size 为 1），加权平均就是原值
+        if half_window == 0:
+            return data
         
-        for i in range(len(data)):
-            start = max(0, i - half_window)
-            end = min(len(data), i + half_window + 1)
-            
-            # 计算高斯权重
-            distances = np.arange(start, end) - i
-            weights = np.exp(-(distances ** 2) / (2 * sigma ** 2))
+        kernel = DataSmoothing._gaussian_kernel(window_size)
+        n = len(data)
+        
+        # 归一化卷积：超出数据范围的部分按0填充，分子为数据的高斯加权和，
+        # 分母为窗口内实际参与的权重之和，两端窗口被截断时权重重新归一化，与逐点加权平均一致
+        weighted_sum = correlate1d(data, kernel, mode='constant', cval=0.0)
+        
+        # 核已归一化，内部点的权重和为1；只有距两端不足 half_window 的点需要
+        # 由核的前缀和求出截断后的权重和，省去对全1序列再做一次卷积
+        weight_total = np.ones(n, dtype=data.dtype)
+        kernel_csum = np.concatenate(([0.0], np.cumsum(kernel)))
+        edge_points = np.concatenate([np.arange(min(half_window, n)),
+                                      np.arange(max(n - half_window, half_window), n)])
+        lo = np.maximum(half_window - edge_points, 0)
+        hi = np.minimum(2 * half_window + 1, half_window + n - edge_points)
+        weight_total[edge_points] = kernel_csum[hi] - kernel_csum[lo]
+        
+        return weighted_sum / weight_total
+    
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _gaussian_kernel(window_size: int) -> np.ndarray:
+        """
+        归一化的高斯核，只依赖窗口大小，按窗口大小缓存复用
+        
+        Args:
+            window_size: 窗口大小
             
-            # 加权平均
-            result[i] = np.sum(data[start:end] * weights) / np.sum(weights)
+        Returns:
+            长度为 2 * (window_size // 2) + 1 的只读高斯核，权重和为1
+        """
+        half_window = window_size // 2
+        sigma = window_size / 3.0
         
-        return result
+        x = np.arange(-half_window, half_window + 1)
+        kernel = np.exp(-0.5 / (sigma * sigma) * x ** 2)
+        kernel /= kernel.sum()
+        # 缓存的核被所有请求共享，设为只读防止被意外修改
+        kernel.flags.writeable = False
+        return kernel
     
     @staticmethod
     def get_method_info() -> Dict[str, Any]:
@@ -159,29 +433,4 @@ class DataSmoothing:
         Returns:
             方法信息字典
         """
-        return {
-            'smooth': {
-                'name': '数据平滑',
-                'description': '对时间序列数据进行平滑处理，减少噪声，提升数据质量',
-                'principle': '通过不同的权重策略对时间窗口内的数据点进行加权平均，消除短期波动，保留长期趋势。移动平均使用等权重，指数平滑赋予近期数据更高权重，高斯平滑使用正态分布权重。',
-                'params': {
-                    'method': {
-                        'type': 'select',
-                        'default': 'moving_average',
-                        'options': [
-                            {'label': '移动平均', 'value': 'moving_average'},
-                            {'label': '指数平滑', 'value': 'exponential'},
-                            {'label': '高斯平滑', 'value': 'gaussian'}
-                        ],
-                        'description': '平滑算法',
-                        'detail': '移动平均（MA）：简单平均，适合平稳数据；指数平滑（EMA）：近期权重更高，适合趋势数据；高斯平滑：使用正态分布权重，平滑效果最好但计算较慢。'
-                    },
-                    'window_size': {
-                        'type': 'int',
-                        'default': 5,
-                        'description': '窗口大小',
-                        'detail': '平滑窗口的数据点数量。值越大平滑效果越强，但会损失更多细节。建议：噪声大用7-15，噪声小用3-7。指数平滑中，窗口大小影响衰减速度（alpha=2/(window+1））。'
-                    }
-                }
-            }
-        }
+        return DataSmoothing._METHOD_INFO
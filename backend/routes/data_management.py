@@ -5,55 +5,87 @@ from flask import Blueprint, jsonify
 import os
 from pathlib import Path
 import json
-import csv
+import orjson
+import time
 from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.data_cleaner import to_float_array
+from utils.binary_encoding import encode_values
 
 data_bp = Blueprint('data', __name__, url_prefix='/api/data')
 
 # 数据目录路径
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data')
+# 数据目录的绝对路径，导入时计算一次，供路径安全检查复用
+_DATA_DIR_ABS = os.path.abspath(DATA_DIR)
 ALLOWED_EXTENSIONS = {'.csv', '.json'}
 
+# 批量转换 Unix 时间戳的范围（秒）：1000-01-02 ~ 9999-12-30
+_BULK_TIMESTAMP_MIN = -30610137600
+_BULK_TIMESTAMP_MAX = 253402128000
 
-def build_file_tree(directory, relative_path=""):
+# 文件树缓存 (各目录修改时间, 文件树)：记录构建时每个被遍历目录的修改时间，任一目录变化时重新构建
+_tree_cache = None
+
+
+def _scan_directory(directory, dir_mtimes=None):
     """
-    递归构建文件树结构，只包含 csv 和 json 文件
+    列出目录中的可见项（跳过隐藏文件），按名称排序
     
     Args:
         directory: 目录路径
-        relative_path: 相对路径（用于生成 key）
+        dir_mtimes: 可选的字典，用于记录该目录的修改时间（纳秒）
     
     Returns:
-        包含文件树结构的字典列表
+        DirEntry 列表，目录不可访问时为空列表
     """
-    tree = []
+    if dir_mtimes is not None:
+        # 在列目录之前记录，遍历期间发生的修改会在下次检查时被发现
+        try:
+            dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
     
     try:
-        items = sorted(os.listdir(directory))
+        # scandir 返回的目录项自带文件类型，is_dir() 通常无需再次 stat
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
     except PermissionError:
-        return tree
+        return []
     
-    for item in items:
-        if item.startswith('.'):  # 跳过隐藏文件
-            continue
-            
-        item_path = os.path.join(directory, item)
-        item_relative_path = os.path.join(relative_path, item) if relative_path else item
+    return [entry for entry in entries if not entry.name.startswith('.')]
+
+
+def build_file_tree(directory, relative_path="", dir_mtimes=None):
+    """
+    构建文件树结构，只包含 csv 和 json 文件
+    
+    使用显式栈做后序遍历（子目录处理完后再挂到父目录下），不受递归深度限制
+    
+    Args:
+        directory: 目录路径
+        relative_path: 相对路径（用于生成 key）
+        dir_mtimes: 可选的字典，用于记录每个被遍历目录的修改时间（纳秒）
+    
+    Returns:
+        包含文件树结构的字典列表
+    """
+    # 栈中每一项: (目录项迭代器, 目录相对路径, 已收集的子节点, 目录名)
+    stack = [(iter(_scan_directory(directory, dir_mtimes)), relative_path, [], None)]
+    
+    while True:
+        entries, current_path, tree, title = stack[-1]
         
-        if os.path.isdir(item_path):
-            # 递归获取子目录
-            children = build_file_tree(item_path, item_relative_path)
+        for entry in entries:
+            item = entry.name
+            item_relative_path = os.path.join(current_path, item) if current_path else item
+            
+            if entry.is_dir():
+                # 先处理子目录，处理完后回到当前目录继续迭代剩余项
+                stack.append((iter(_scan_directory(entry.path, dir_mtimes)), item_relative_path, [], item))
+                break
             
-            # 只添加包含支持文件的目录
-            if children:
-                tree.append({
-                    'title': item,
-                    'key': item_relative_path,
-                    'type': 'folder',
-                    'children': children,
-                    'selectable': False
-                })
-        else:
             # 检查文件扩展名
             file_ext = os.path.splitext(item)[1].lower()
             if file_ext in ALLOWED_EXTENSIONS:
@@ -65,10 +97,145 @@ def build_file_tree(directory, relative_path=""):
                     'isLeaf': True,
                     'selectable': True
                 })
+        else:
+            # 当前目录的所有项已处理完
+            stack.pop()
+            if not stack:
+                return tree
+            
+            # 只添加包含支持文件的目录
+            if tree:
+                stack[-1][2].append({
+                    'title': title,
+                    'key': current_path,
+                    'type': 'folder',
+                    'children': tree,
+                    'selectable': False
+                })
+
+
+def get_cached_file_tree():
+    """
+    获取数据目录的文件树，目录未发生变化时直接返回缓存
+    
+    在目录中增删文件或子目录会改变该目录自身的修改时间，
+    因此只需检查每个被遍历目录的 mtime，无需重新遍历所有文件
+    
+    Returns:
+        包含文件树结构的字典列表
+    """
+    global _tree_cache
+    
+    # 取一次引用，避免并发请求替换缓存时读到不匹配的 mtime 和文件树
+    cache = _tree_cache
+    if cache is not None:
+        cached_mtimes, cached_tree = cache
+        try:
+            if all(os.stat(path).st_mtime_ns == mtime for path, mtime in cached_mtimes.items()):
+                return cached_tree
+        except OSError:
+            # 目录已被删除，重新构建
+            pass
     
+    dir_mtimes = {}
+    tree = build_file_tree(DATA_DIR, dir_mtimes=dir_mtimes)
+    _tree_cache = (dir_mtimes, tree)
     return tree
 
 
+def _is_within_data_dir(full_path):
+    """
+    检查路径是否位于数据目录内
+    
+    按路径组件比较而不是字符串前缀，避免 /data-evil 这类与 /data 前缀相同的目录通过检查
+    
+    Args:
+        full_path: 待检查的文件路径
+    
+    Returns:
+        位于数据目录内返回 True，否则返回 False
+    """
+    try:
+        return os.path.commonpath([os.path.abspath(full_path), _DATA_DIR_ABS]) == _DATA_DIR_ABS
+    except ValueError:
+        # 不同驱动器上的路径（Windows）无法比较
+        return False
+
+
+def _utc_offset(t: int):
+    """
+    查询时间戳 t（秒）处本地时区相对 UTC 的偏移秒数
+    
+    Returns:
+        偏移秒数；平台无法转换该时间戳时（如 Windows 上的负时间戳）返回 None
+    """
+    try:
+        return time.localtime(t).tm_gmtoff
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _format_unix_timestamps(keys):
+    """
+    将 Unix 时间戳（秒）批量转换为本地时间字符串 '%Y-%m-%d %H:%M:%S'
+    
+    结果与逐个调用 datetime.fromtimestamp(...).strftime(...) 一致：本地时区偏移按
+    15 分钟分段查询，格式化由 numpy 整体完成。年份不在 1000-9999 范围内的时间戳逐个转换
+    
+    Args:
+        keys: 整数形式的时间戳字符串数组（object 类型）
+    
+    Returns:
+        与 keys 等长的字符串数组（object 类型），超出可表示范围的时间戳保持原样
+    """
+    formatted = keys.copy()
+    
+    try:
+        seconds = keys.astype(np.int64)
+        in_range = (seconds >= _BULK_TIMESTAMP_MIN) & (seconds <= _BULK_TIMESTAMP_MAX)
+    except OverflowError:
+        in_range = np.zeros(len(keys), dtype=bool)
+    
+    bulk_positions = np.flatnonzero(in_range)
+    if len(bulk_positions) > 0:
+        bulk_seconds = seconds[bulk_positions]
+        # 时区偏移很少变化：每个 15 分钟区间只查询区间首尾两次，
+        # 区间内发生时区切换（首尾偏移不同）时再逐个查询该区间内的时间戳
+        segments, inverse = np.unique(bulk_seconds // 900, return_inverse=True)
+        segment_starts = (segments * 900).tolist()
+        start_offsets = [_utc_offset(t) for t in segment_starts]
+        end_offsets = [_utc_offset(t + 899) for t in segment_starts]
+        # 偏移查询失败的区间（如 Windows 上 1970 年以前的负时间戳）交给下面的逐个转换
+        segment_ok = np.array([start is not None and end is not None
+                               for start, end in zip(start_offsets, end_offsets)], dtype=bool)
+        start_offsets = np.array([offset or 0 for offset in start_offsets], dtype=np.int64)
+        end_offsets = np.array([offset or 0 for offset in end_offsets], dtype=np.int64)
+        
+        row_ok = segment_ok[inverse]
+        offsets = start_offsets[inverse]
+        for j in np.flatnonzero(row_ok & (offsets != end_offsets[inverse])):
+            offset = _utc_offset(int(bulk_seconds[j]))
+            if offset is None:
+                row_ok[j] = False
+            else:
+                offsets[j] = offset
+        
+        in_range[bulk_positions[~row_ok]] = False
+        local_seconds = bulk_seconds[row_ok] + offsets[row_ok]
+        formatted[bulk_positions[row_ok]] = np.char.replace(
+            np.datetime_as_string(local_seconds.astype('datetime64[s]'), unit='s'), 'T', ' ')
+    
+    # 超出批量转换范围的时间戳逐个转换
+    for i in np.flatnonzero(~in_range):
+        try:
+            formatted[i] = datetime.fromtimestamp(int(keys[i])).strftime('%Y-%m-%d %H:%M:%S')
+        except (ValueError, OverflowError, OSError):
+            # 超出可表示范围的时间戳，保持原样
+            continue
+    
+    return formatted
+
+
 @data_bp.route('/files', methods=['GET'])
 def get_file_tree():
     """
@@ -85,7 +252,7 @@ def get_file_tree():
                 'tree': []
             }), 404
         
-        tree = build_file_tree(DATA_DIR)
+        tree = get_cached_file_tree()
         
         return jsonify({
             'success': True,
@@ -126,7 +293,7 @@ def get_file_info():
     full_path = os.path.join(DATA_DIR, file_path)
     
     # 安全检查：确保路径在 DATA_DIR 内
-    if not os.path.abspath(full_path).startswith(os.path.abspath(DATA_DIR)):
+    if not _is_within_data_dir(full_path):
         return jsonify({
             'success': False,
             'message': 'Invalid file path'
@@ -166,6 +333,8 @@ def read_file():
     
     Query Parameters:
         path: 文件相对路径
+        format: 数值的返回格式，'json'（默认）或 'binary'；
+            'binary' 时以 values_b64（小端 float32 的 base64）、dtype、n 代替 values
     
     Returns:
         包含时间戳和值的数组
@@ -173,6 +342,7 @@ def read_file():
     from flask import request
     
     file_path = request.args.get('path', '')
+    binary_format = request.args.get('format', 'json') == 'binary'
     
     if not file_path:
         return jsonify({
@@ -183,7 +353,7 @@ def read_file():
     full_path = os.path.join(DATA_DIR, file_path)
     
     # 安全检查：确保路径在 DATA_DIR 内
-    if not os.path.abspath(full_path).startswith(os.path.abspath(DATA_DIR)):
+    if not _is_within_data_dir(full_path):
         return jsonify({
             'success': False,
             'message': 'Invalid file path'
@@ -200,32 +370,33 @@ def read_file():
         
         if file_ext == '.csv':
             # 读取 CSV 文件
-            timestamps = []
-            values = []
+            # 使用 pandas 的 C 解析器整列读取，代替 csv.DictReader 逐行解析和 float() 转换
+            # 两列都按原始字符串读取：时间戳保持文件中的原样，数值列随后统一转换
+            try:
+                df = pd.read_csv(full_path, encoding='utf-8', engine='c',
+                                 usecols=lambda column: column in ('timestamp', 'value'),
+                                 dtype=str, na_filter=False)
+            except pd.errors.EmptyDataError:
+                df = pd.DataFrame()
             
-            with open(full_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    # 假设 CSV 有 timestamp 和 value 列
-                    if 'timestamp' in row and 'value' in row:
-                        try:
-                            value = float(row['value'])
-                            # 跳过 NaN 和 Infinity 值
-                            if not (value != value or value == float('inf') or value == float('-inf')):
-                                timestamps.append(row['timestamp'])
-                                values.append(value)
-                                count += 1
-                        except (ValueError, TypeError):
-                            # 跳过无法转换的值
-                            continue
+            # 假设 CSV 有 timestamp 和 value 列
+            if 'timestamp' in df.columns and 'value' in df.columns:
+                # 无法转换的值记为 NaN，与 NaN 和 Infinity 一起跳过
+                numeric = pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype=np.float64)
+                finite = np.isfinite(numeric)
+                timestamps = df['timestamp'].to_numpy()[finite].tolist()
+                # 数值保持为 numpy 数组，由 orjson 直接序列化，不经过 Python 列表
+                values = numeric[finite]
+            else:
+                timestamps = []
+                values = []
+            count = len(values)
             
             return jsonify({
                 'success': True,
                 'data': {
                     'timestamps': timestamps,
-                    'values': values,
+                    **encode_values(values, binary_format),
                     'total_points': count,
                     'file_type': 'csv'
                 }
@@ -233,53 +404,43 @@ def read_file():
         
         elif file_ext == '.json':
             # 读取 JSON 文件
-            import re
-            with open(full_path, 'r', encoding='utf-8') as f:
+            with open(full_path, 'rb') as f:
                 content = f.read()
-                # 处理特殊值：NaN, Infinity, -Infinity
-                # 使用正则表达式确保只替换值位置的特殊字符
-                content = re.sub(r':\s*NaN\s*([,}])', r': null\1', content)
-                content = re.sub(r':\s*Infinity\s*([,}])', r': null\1', content)
-                content = re.sub(r':\s*-Infinity\s*([,}])', r': null\1', content)
-                data = json.loads(content)
+            try:
+                # 标准 JSON 直接用 orjson 解析
+                data = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # 文件中含有 NaN, Infinity, -Infinity 等非标准值时退回标准库，
+                # 由 parse_constant 在解析过程中直接转换为 null，无需预先扫描替换
+                data = json.loads(content, parse_constant=lambda constant: None)
             
             # 假设 JSON 是 {timestamp: value} 格式
             if isinstance(data, dict):
-                timestamps = []
-                values = []
-                count = 0
+                keys = np.array(sorted(data), dtype=object)
+                
+                # 整体转换数值：null（由 NaN/Infinity 转换而来）和无法转换的值记为 NaN，
+                # 与 NaN 和 Infinity 一起由同一个掩码跳过；时间戳用同一掩码筛选，保持与数值一一对应
+                raw_values = [data[key] for key in keys]
+                numeric = to_float_array(raw_values)
+                if numeric.ndim != 1:
+                    # 各值都是等长数组时会被整体转换为二维数组；非标量值与其他无法转换的值一样记为 NaN
+                    numeric = to_float_array([None if isinstance(value, (list, dict)) else value
+                                              for value in raw_values])
+                finite = np.isfinite(numeric)
+                keys = keys[finite]
+                values = numeric[finite]
+                count = len(values)
                 
-                for ts, val in sorted(data.items()):
-                    # 跳过 null 值（由 NaN/Infinity 转换而来）
-                    if val is None:
-                        continue
-                    
-                    # 尝试将时间戳转换为可读格式
-                    try:
-                        # 如果是 Unix 时间戳
-                        ts_int = int(ts)
-                        dt = datetime.fromtimestamp(ts_int)
-                        timestamps.append(dt.strftime('%Y-%m-%d %H:%M:%S'))
-                    except:
-                        # 如果不是数字时间戳，直接使用
-                        timestamps.append(ts)
-                    
-                    try:
-                        value = float(val)
-                        # 再次检查是否为特殊值
-                        if value != value or value == float('inf') or value == float('-inf'):
-                            continue
-                        values.append(value)
-                        count += 1
-                    except (ValueError, TypeError):
-                        # 跳过无法转换为浮点数的值
-                        continue
+                # 整数形式的键视为 Unix 时间戳，转换为可读格式；其余键直接使用
+                is_unix = pd.Series(keys, dtype=object).str.fullmatch(r'\s*[+-]?\d+\s*').to_numpy(dtype=bool)
+                keys[is_unix] = _format_unix_timestamps(keys[is_unix])
+                timestamps = keys.tolist()
                 
                 return jsonify({
                     'success': True,
                     'data': {
                         'timestamps': timestamps,
-                        'values': values,
+                        **encode_values(values, binary_format),
                         'total_points': count,
                         'file_type': 'json'
                     }
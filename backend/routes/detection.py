@@ -2,6 +2,8 @@
 异常检测相关的 API 路由
 """
 
+import json
+import numpy as np
 from flask import Blueprint, request, jsonify
 from detection.three_sigma import ThreeSigmaDetection
 from detection.iqr import IQRDetection
@@ -11,11 +13,31 @@ from detection.kmeans import KMeansDetection
 from detection.matrix_profile import MatrixProfileDetection
 from detection.dbscan import DBSCANDetection
 from detection.norma import NormADetection
-from utils.data_cleaner import validate_data, get_data_quality_info
+from utils.data_cleaner import analyze, validate_quality
+from utils.binary_encoding import encode_values
+from utils.request_body import MAX_POINTS, MAX_REQUEST_BYTES, body_too_large, parse_json_body
 
 detection_bp = Blueprint('detection', __name__, url_prefix='/api/detection')
 
 
+def _as_bool(value, default: bool) -> bool:
+    """
+    将布尔参数转换为 bool，兼容以字符串或数字形式传入的值（如 "false"、"0"）
+    
+    Args:
+        value: 请求中的参数值
+        default: 参数缺失（None）时的默认值
+        
+    Returns:
+        转换后的布尔值
+    """
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in ('false', '0', 'no', 'off', '')
+    return bool(value)
+
+
 @detection_bp.route('/methods', methods=['GET'])
 def get_methods():
     """
@@ -36,7 +58,9 @@ def get_methods():
     }
     """
     try:
-        methods_dict = ThreeSigmaDetection.get_method_info()
+        # get_method_info 返回的是共享常量，合并到新字典中，避免修改原对象
+        methods_dict = {}
+        methods_dict.update(ThreeSigmaDetection.get_method_info())
         # 添加 IQR 方法
         methods_dict.update(IQRDetection.get_method_info())
         # 添加 KNN 方法
@@ -100,39 +124,98 @@ def detect_anomalies():
             }
         }
     }
+    
+    二进制请求（大数据量时使用，避免逐个构造 Python float）:
+        Content-Type: application/octet-stream
+        请求体: 小端 float32 数组
+        查询参数: method=3sigma&params={"sigma_threshold": 3.0}
+    此时返回结果中不回传 timestamps 和 values
+    
+    查询参数 format=binary 时（仅 JSON 请求），回传的 values 以
+    values_b64（小端 float32 的 base64）、dtype、n 代替
+    查询参数 echo_timestamps=false 时（仅 JSON 请求），不回传 timestamps
     """
     try:
-        data = request.get_json()
-        
-        timestamps = data.get('timestamps', [])
-        values = data.get('values', [])
-        method_config = data.get('method', {})
-        
-        if not timestamps or not values:
+        if body_too_large(request.content_length):
             return jsonify({
                 'success': False,
-                'message': '缺少必要参数: timestamps 和 values'
-            }), 400
+                'message': f'请求数据过大（超过 {MAX_REQUEST_BYTES // (1024 * 1024)} MB）'
+            }), 413
+        
+        binary_request = request.mimetype == 'application/octet-stream'
         
-        if len(timestamps) != len(values):
+        if binary_request:
+            # 直接在请求体缓冲区上构造数组，不经过 Python 列表
+            body = request.get_data(cache=False)
+            if len(body) % 4 != 0:
+                return jsonify({
+                    'success': False,
+                    'message': '二进制数据长度必须是 4 的整数倍 (float32)'
+                }), 400
+            values = np.frombuffer(body, dtype='<f4')
+            timestamps = None
+            method_type = request.args.get('method')
+            params = json.loads(request.args.get('params', '{}'))
+            if not isinstance(params, dict):
+                return jsonify({
+                    'success': False,
+                    'message': '参数格式错误: params 必须是 JSON 对象'
+                }), 400
+            
+            if len(values) == 0:
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: values'
+                }), 400
+        else:
+            # 直接用 orjson 解析请求体，不缓存原始数据
+            data = parse_json_body(request.get_data(cache=False))
+            if not isinstance(data, dict):
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: 请求体必须是 JSON 对象'
+                }), 400
+            
+            timestamps = data.get('timestamps', [])
+            values = data.get('values', [])
+            method_config = data.get('method', {})
+            
+            if not isinstance(timestamps, list) or not isinstance(values, list) or not timestamps or not values:
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: timestamps 和 values'
+                }), 400
+            
+            if len(timestamps) != len(values):
+                return jsonify({
+                    'success': False,
+                    'message': 'timestamps 和 values 长度不一致'
+                }), 400
+            
+            if not isinstance(method_config, dict) or not isinstance(method_config.get('params', {}), dict):
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: method（须为包含 type 和 params 的对象）'
+                }), 400
+            
+            method_type = method_config.get('type')
+            params = method_config.get('params', {})
+        
+        if len(values) > MAX_POINTS:
             return jsonify({
                 'success': False,
-                'message': 'timestamps 和 values 长度不一致'
-            }), 400
+                'message': f'数据点过多（最多 {MAX_POINTS} 个）'
+            }), 413
         
-        method_type = method_config.get('type')
-        params = method_config.get('params', {})
-        
-        # 统一的数据验证和质量检查
-        is_valid, error_message = validate_data(values)
+        # 统一的数据验证和质量检查：只转换一次数据，同时得到质量信息（用于日志和统计）
+        data, _, quality_info = analyze(values)
+        is_valid, error_message = validate_quality(quality_info)
         if not is_valid:
             return jsonify({
                 'success': False,
                 'message': f'数据验证失败: {error_message}'
             }), 400
         
-        # 获取数据质量信息（用于日志和统计）
-        quality_info = get_data_quality_info(values)
         if quality_info['invalid_points'] > 0:
             print(f"警告: 数据包含 {quality_info['invalid_points']} 个无效值 "
                   f"(NaN: {quality_info['nan_count']}, Inf: {quality_info['inf_count']}), "
@@ -141,36 +224,37 @@ def detect_anomalies():
         # 根据方法类型调用相应的检测算法
         if method_type == '3sigma':
             sigma_threshold = params.get('sigma_threshold', 3.0)
-            anomalies, stats = ThreeSigmaDetection.detect(values, sigma_threshold)
+            anomalies, stats = ThreeSigmaDetection.detect(data, sigma_threshold)
         elif method_type == 'iqr':
             iqr_multiplier = params.get('iqr_multiplier', 1.5)
-            anomalies, stats = IQRDetection.detect(values, iqr_multiplier)
+            anomalies, stats = IQRDetection.detect(data, iqr_multiplier)
         elif method_type == 'knn':
             n_neighbors = params.get('n_neighbors', 5)
             contamination = params.get('contamination', 0.1)
-            anomalies, stats = KNNDetection.detect(values, n_neighbors, contamination)
+            use_time_index = _as_bool(params.get('use_time_index'), True)
+            anomalies, stats = KNNDetection.detect(data, n_neighbors, contamination, use_time_index)
         elif method_type == 'lof':
             n_neighbors = params.get('n_neighbors', 20)
             contamination = params.get('contamination', 0.1)
-            anomalies, stats = LOFDetection.detect(values, n_neighbors, contamination)
+            anomalies, stats = LOFDetection.detect(data, n_neighbors, contamination)
         elif method_type == 'kmeans':
             n_clusters = params.get('n_clusters', 3)
             contamination = params.get('contamination', 0.1)
             max_iter = params.get('max_iter', 100)
-            anomalies, stats = KMeansDetection.detect(values, n_clusters, contamination, max_iter)
+            anomalies, stats = KMeansDetection.detect(data, n_clusters, contamination, max_iter)
         elif method_type == 'matrix_profile':
             window_size = params.get('window_size', 10)
             contamination = params.get('contamination', 0.1)
-            anomalies, stats = MatrixProfileDetection.detect(values, window_size, contamination)
+            anomalies, stats = MatrixProfileDetection.detect(data, window_size, contamination)
         elif method_type == 'dbscan':
             eps = params.get('eps', 0.5)
             min_samples = params.get('min_samples', 5)
-            anomalies, stats = DBSCANDetection.detect(values, eps, min_samples)
+            anomalies, stats = DBSCANDetection.detect(data, eps, min_samples)
         elif method_type == 'norma':
             window_size = params.get('window_size', 10)
             contamination = params.get('contamination', 0.1)
             sensitivity = params.get('sensitivity', 1.0)
-            anomalies, stats = NormADetection.detect(values, window_size, contamination, sensitivity)
+            anomalies, stats = NormADetection.detect(data, window_size, contamination, sensitivity)
         else:
             return jsonify({
                 'success': False,
@@ -180,18 +264,22 @@ def detect_anomalies():
         # 将数据质量信息添加到统计结果中
         stats['data_quality'] = quality_info
         
-        # 获取异常点的索引
-        anomaly_indices = [i for i, is_anomaly in enumerate(anomalies) if is_anomaly]
+        # 获取异常点的索引（各检测方法都返回布尔数组，直接在数组上求非零位置）
+        anomaly_indices = np.flatnonzero(anomalies)
+        
+        result = {
+            'anomalies': anomalies,
+            'anomaly_indices': anomaly_indices,
+            'stats': stats
+        }
+        if not binary_request:
+            if request.args.get('echo_timestamps', 'true') != 'false':
+                result['timestamps'] = timestamps
+            result.update(encode_values(values, request.args.get('format', 'json') == 'binary'))
         
         return jsonify({
             'success': True,
-            'data': {
-                'timestamps': timestamps,
-                'values': values,
-                'anomalies': anomalies,
-                'anomaly_indices': anomaly_indices,
-                'stats': stats
-            }
+            'data': result
         })
         
     except ValueError as e:
@@ -2,13 +2,137 @@
 数据预处理相关的 API 路由
 """
 
-from flask import Blueprint, request, jsonify
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import orjson
+from flask import Blueprint, Response, request, jsonify
 from preprocessing.smoothing import DataSmoothing
-from utils.data_cleaner import validate_data, get_data_quality_info
+from utils.data_cleaner import all_finite, analyze, validate_quality
+from utils.request_body import MAX_POINTS, MAX_REQUEST_BYTES, body_too_large, parse_json_body
 
 preprocessing_bp = Blueprint('preprocessing', __name__, url_prefix='/api/preprocessing')
 
 
+def _build_methods_response_body() -> bytes:
+    """
+    序列化预处理方法信息
+    
+    方法信息是各预处理类的共享常量，运行期间不会变化，导入时序列化一次即可
+    """
+    # get_method_info 返回的是共享常量，合并到新字典中，避免修改原对象
+    methods_dict = {}
+    methods_dict.update(DataSmoothing.get_method_info())
+    # 未来可以添加更多预处理方法类型
+    # methods_dict.update(Detrending.get_method_info())
+    
+    return orjson.dumps({'success': True, 'data': methods_dict}, option=orjson.OPT_APPEND_NEWLINE)
+
+
+_METHODS_RESPONSE_BODY = _build_methods_response_body()
+_METHODS_RESPONSE_ETAG = hashlib.sha1(_METHODS_RESPONSE_BODY).hexdigest()
+
+# 平滑结果缓存：前端切换视图时经常重复提交相同的数据和参数，
+# 按 (数据, 方法, 窗口大小, 计算类型) 缓存平滑结果，相同请求不必重新计算
+_SMOOTH_CACHE_MAX_ENTRIES = 512
+_SMOOTH_CACHE_MAX_POINTS = 1 << 20          # 超过该长度的数据不缓存
+_SMOOTH_CACHE_MAX_BYTES = 256 << 20         # 缓存结果的总内存上限
+_smooth_cache = OrderedDict()
+_smooth_cache_bytes = 0
+_smooth_cache_lock = threading.Lock()
+
+
+def _smooth_cache_key(data: np.ndarray, method, window_size, dtype) -> bytes:
+    """
+    由已转换的 float64 数据和平滑参数生成缓存键
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(data).tobytes(), digest_size=16).digest()
+    return digest + f'|{method}|{window_size}|{np.dtype(dtype).name}'.encode()
+
+
+def _smooth_cache_get(key: bytes):
+    """
+    查找缓存的平滑结果，命中时移到最近使用的位置；未命中返回 None
+    """
+    with _smooth_cache_lock:
+        result = _smooth_cache.get(key)
+        if result is not None:
+            _smooth_cache.move_to_end(key)
+        return result
+
+
+def _smooth_cache_put(key: bytes, result: np.ndarray) -> None:
+    """
+    缓存平滑结果，超出条目数或内存上限时淘汰最久未使用的结果
+    """
+    global _smooth_cache_bytes
+    if len(result) > _SMOOTH_CACHE_MAX_POINTS:
+        return
+    # 缓存的数组被多个请求共享，设为只读防止被意外修改
+    result.flags.writeable = False
+    with _smooth_cache_lock:
+        if key in _smooth_cache:
+            return
+        _smooth_cache[key] = result
+        _smooth_cache_bytes += result.nbytes
+        while len(_smooth_cache) > _SMOOTH_CACHE_MAX_ENTRIES or _smooth_cache_bytes > _SMOOTH_CACHE_MAX_BYTES:
+            _, evicted = _smooth_cache.popitem(last=False)
+            _smooth_cache_bytes -= evicted.nbytes
+
+
+def _prepare_values(values):
+    """
+    检查数据点数并完成数据验证和质量检查，JSON 和二进制请求共用
+    
+    Returns:
+        (转换后的 float64 数组, None)；验证失败时为 (None, 错误响应)
+    """
+    if len(values) > MAX_POINTS:
+        return None, (jsonify({
+            'success': False,
+            'message': f'数据点过多（最多 {MAX_POINTS} 个）'
+        }), 413)
+    
+    # 统一的数据验证和质量检查：只转换一次数据，同时得到质量信息（用于日志）
+    data, _, quality_info = analyze(values)
+    is_valid, error_message = validate_quality(quality_info)
+    if not is_valid:
+        return None, (jsonify({
+            'success': False,
+            'message': f'数据验证失败: {error_message}'
+        }), 400)
+    
+    if quality_info['invalid_points'] > 0:
+        print(f"警告: 数据包含 {quality_info['invalid_points']} 个无效值 "
+              f"(NaN: {quality_info['nan_count']}, Inf: {quality_info['inf_count']}), "
+              f"将在预处理过程中使用插值处理")
+    
+    return data, None
+
+
+def _smooth_cached(data: np.ndarray, method, window_size, dtype):
+    """
+    平滑已验证的数据，相同的数据和参数直接复用缓存的结果
+    
+    Returns:
+        平滑结果数组；结果中含有 NaN 或 Inf 时返回 None
+    """
+    cache_key = _smooth_cache_key(data, method, window_size, dtype)
+    smoothed_values = _smooth_cache_get(cache_key)
+    if smoothed_values is None:
+        # 应用平滑：data 是 analyze 转换得到的新数组，之后不再使用，直接在其上清洗，
+        # 结果只在这里检查一次
+        smoothed_values = DataSmoothing.apply(data, method, window_size, dtype, skip_validation=True)
+        
+        # 验证结果（平滑结果是 numpy 数组，响应中直接使用该数组）
+        if not all_finite(smoothed_values):
+            return None
+        
+        _smooth_cache_put(cache_key, smoothed_values)
+    return smoothed_values
+
+
 @preprocessing_bp.route('/smooth', methods=['POST'])
 def apply_smoothing():
     """
@@ -19,7 +143,8 @@ def apply_smoothing():
         "timestamps": ["2024-01-01 00:00:00", ...],
         "values": [1.0, 2.0, 3.0, ...],
         "method": "moving_average",  // 'moving_average', 'exponential', 'gaussian'
-        "window_size": 5
+        "window_size": 5,
+        "dtype": "float64"           // 可选，'float32' 时以单精度计算（大数据量更快）
     }
     
     返回:
@@ -30,59 +155,89 @@ def apply_smoothing():
             "values": [...]  // 平滑后的值
         }
     }
+    
+    查询参数 echo_timestamps=false 时返回结果中不包含 timestamps
+    
+    二进制请求（大数据量时使用，避免逐个构造 Python float，与检测接口的约定相同）:
+        Content-Type: application/octet-stream
+        请求体: 小端 float32 数组
+        查询参数: method=moving_average&window_size=5&dtype=float64
+    此时返回结果中不回传 timestamps
     """
     try:
-        data = request.get_json()
-        
-        timestamps = data.get('timestamps', [])
-        values = data.get('values', [])
-        method = data.get('method', 'moving_average')
-        window_size = data.get('window_size', 5)
-        
-        if not timestamps or not values:
-            return jsonify({
-                'success': False,
-                'message': '缺少必要参数: timestamps 和 values'
-            }), 400
-        
-        if len(timestamps) != len(values):
+        if body_too_large(request.content_length):
             return jsonify({
                 'success': False,
-                'message': 'timestamps 和 values 长度不一致'
-            }), 400
+                'message': f'请求数据过大（超过 {MAX_REQUEST_BYTES // (1024 * 1024)} MB）'
+            }), 413
         
-        # 统一的数据验证和质量检查
-        is_valid, error_message = validate_data(values)
-        if not is_valid:
-            return jsonify({
-                'success': False,
-                'message': f'数据验证失败: {error_message}'
-            }), 400
+        binary_request = request.mimetype == 'application/octet-stream'
         
-        # 获取数据质量信息（用于日志）
-        quality_info = get_data_quality_info(values)
-        if quality_info['invalid_points'] > 0:
-            print(f"警告: 数据包含 {quality_info['invalid_points']} 个无效值 "
-                  f"(NaN: {quality_info['nan_count']}, Inf: {quality_info['inf_count']}), "
-                  f"将在预处理过程中使用插值处理")
+        if binary_request:
+            # 直接在请求体缓冲区上构造数组，不经过 Python 列表
+            body = request.get_data(cache=False)
+            if len(body) % 4 != 0:
+                return jsonify({
+                    'success': False,
+                    'message': '二进制数据长度必须是 4 的整数倍 (float32)'
+                }), 400
+            values = np.frombuffer(body, dtype='<f4')
+            timestamps = None
+            method = request.args.get('method', 'moving_average')
+            window_size = request.args.get('window_size', 5, type=int)
+            dtype = np.float32 if request.args.get('dtype') == 'float32' else np.float64
+            
+            if len(values) == 0:
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: values'
+                }), 400
+        else:
+            # 直接用 orjson 解析请求体，不缓存原始数据
+            data = parse_json_body(request.get_data(cache=False))
+            if not isinstance(data, dict):
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: 请求体必须是 JSON 对象'
+                }), 400
+            
+            timestamps = data.get('timestamps', [])
+            values = data.get('values', [])
+            method = data.get('method', 'moving_average')
+            window_size = data.get('window_size', 5)
+            dtype = np.float32 if data.get('dtype') == 'float32' else np.float64
+            
+            if not isinstance(timestamps, list) or not isinstance(values, list) or not timestamps or not values:
+                return jsonify({
+                    'success': False,
+                    'message': '缺少必要参数: timestamps 和 values'
+                }), 400
+            
+            if len(timestamps) != len(values):
+                return jsonify({
+                    'success': False,
+                    'message': 'timestamps 和 values 长度不一致'
+                }), 400
         
-        # 应用平滑（smoothing.py会使用data_cleaner进行数据清洗）
-        smoothed_values = DataSmoothing.apply(values, method, window_size)
+        data, error_response = _prepare_values(values)
+        if error_response is not None:
+            return error_response
         
-        # 验证结果
-        import math
-        if any(math.isnan(v) or math.isinf(v) for v in smoothed_values):
+        smoothed_values = _smooth_cached(data, method, window_size, dtype)
+        if smoothed_values is None:
             return jsonify({
                 'success': False,
                 'message': '平滑处理产生了无效值（NaN 或 Inf），请检查输入数据'
             }), 500
         
+        result = {'values': smoothed_values}
+        # 查询参数 echo_timestamps=false 时不回传 timestamps（与请求中的相同，前端可直接复用）
+        if not binary_request and request.args.get('echo_timestamps', 'true') != 'false':
+            result['timestamps'] = timestamps
+        
         return jsonify({
             'success': True,
-            'data': {
-                'timestamps': timestamps,
-                'values': smoothed_values
-            }
+            'data': result
         })
         
     except ValueError as e:
@@ -133,15 +288,29 @@ def apply_pipeline():
             "values": [...]  // 经过所有预处理后的值
         }
     }
+    
+    查询参数 echo_timestamps=false 时返回结果中不包含 timestamps
     """
     try:
-        data = request.get_json()
+        if body_too_large(request.content_length):
+            return jsonify({
+                'success': False,
+                'message': f'请求数据过大（超过 {MAX_REQUEST_BYTES // (1024 * 1024)} MB）'
+            }), 413
+        
+        # 直接用 orjson 解析请求体，不缓存原始数据
+        data = parse_json_body(request.get_data(cache=False))
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'message': '缺少必要参数: 请求体必须是 JSON 对象'
+            }), 400
         
         timestamps = data.get('timestamps', [])
         values = data.get('values', [])
         methods = data.get('methods', [])
         
-        if not timestamps or not values:
+        if not isinstance(timestamps, list) or not isinstance(values, list) or not timestamps or not values:
             return jsonify({
                 'success': False,
                 'message': '缺少必要参数: timestamps 和 values'
@@ -153,23 +322,19 @@ def apply_pipeline():
                 'message': 'timestamps 和 values 长度不一致'
             }), 400
         
-        # 统一的数据验证和质量检查
-        is_valid, error_message = validate_data(values)
-        if not is_valid:
+        if not isinstance(methods, list) or not all(
+                isinstance(m, dict) and isinstance(m.get('params', {}), dict) for m in methods):
             return jsonify({
                 'success': False,
-                'message': f'数据验证失败: {error_message}'
+                'message': '缺少必要参数: methods（须为包含 type 和 params 的对象数组）'
             }), 400
         
-        # 获取数据质量信息（用于日志）
-        quality_info = get_data_quality_info(values)
-        if quality_info['invalid_points'] > 0:
-            print(f"警告: 数据包含 {quality_info['invalid_points']} 个无效值 "
-                  f"(NaN: {quality_info['nan_count']}, Inf: {quality_info['inf_count']}), "
-                  f"将在预处理过程中使用插值处理")
+        data, error_response = _prepare_values(values)
+        if error_response is not None:
+            return error_response
         
-        # 依次应用每个预处理方法
-        processed_values = values
+        # 收集每个预处理步骤
+        smooth_steps = []
         for method_config in methods:
             method_type = method_config.get('type')
             params = method_config.get('params', {})
@@ -177,25 +342,31 @@ def apply_pipeline():
             if method_type == 'smooth':
                 method = params.get('method', 'moving_average')
                 window_size = params.get('window_size', 5)
-                processed_values = DataSmoothing.apply(processed_values, method, window_size)
+                dtype = np.float32 if params.get('dtype') == 'float32' else np.float64
+                smooth_steps.append((method, window_size, dtype))
             # 未来可以在这里添加其他预处理方法
             # elif method_type == 'detrend':
             #     processed_values = Detrending.apply(processed_values, **params)
         
-        # 验证结果
-        import math
-        if any(math.isnan(v) or math.isinf(v) for v in processed_values):
+        # 依次应用平滑步骤（连续的线性平滑会合并为一次卷积）
+        # data 是 analyze 转换得到的新数组，之后不再使用，直接在其上处理，结果只在下面检查一次
+        processed_values = DataSmoothing.apply_chain(data, smooth_steps, skip_validation=True)
+        
+        # 验证结果（处理结果是 numpy 数组，响应中直接使用该数组）
+        if not all_finite(processed_values):
             return jsonify({
                 'success': False,
                 'message': '预处理产生了无效值（NaN 或 Inf），请检查输入数据和方法参数'
             }), 500
         
+        result = {'values': processed_values}
+        # 查询参数 echo_timestamps=false 时不回传 timestamps（与请求中的相同，前端可直接复用）
+        if request.args.get('echo_timestamps', 'true') != 'false':
+            result['timestamps'] = timestamps
+        
         return jsonify({
             'success': True,
-            'data': {
-                'timestamps': timestamps,
-                'values': processed_values
-            }
+            'data': result
         })
         
     except ValueError as e:
@@ -234,18 +405,10 @@ def get_methods():
         }
     }
     """
-    try:
-        methods_dict = DataSmoothing.get_method_info()
-        # 未来可以添加更多预处理方法类型
-        # methods_dict.update(Detrending.get_method_info())
-        
-        return jsonify({
-            'success': True,
-            'data': methods_dict
-        })
-    except Exception as e:
-        print(f"Error in get_methods: {str(e)}")
-        return jsonify({
-            'success': False,
-            'message': f'获取方法信息时出错: {str(e)}'
-        }), 500
+    # 响应内容在导入时已序列化，直接返回
+    # 允许客户端缓存，但每次使用前用 ETag 向服务器确认（未变化时返回 304），
+    # 后端更新方法信息后客户端能立即拿到新内容
+    response = Response(_METHODS_RESPONSE_BODY, mimetype='application/json')
+    response.set_etag(_METHODS_RESPONSE_ETAG)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
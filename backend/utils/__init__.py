@@ -2,6 +2,14 @@
 工具模块
 提供通用的工具函数
 """
-from .data_cleaner import clean_data, validate_data, get_data_quality_info
+from .data_cleaner import (to_float_array, all_finite, clean_data, clean_data_inplace, analyze, validate_quality,
+                           validate_data, get_data_quality_info)
+from .binary_encoding import pack_floats, encode_values
+from .request_body import MAX_REQUEST_BYTES, MAX_POINTS, body_too_large, parse_json_body
+from .parallel import thread_budget
 
-__all__ = ['clean_data', 'validate_data', 'get_data_quality_info']
+__all__ = ['to_float_array', 'all_finite', 'clean_data', 'clean_data_inplace', 'analyze', 'validate_quality',
+           'validate_data', 'get_data_quality_info',
+           'pack_floats', 'encode_values',
+           'MAX_REQUEST_BYTES', 'MAX_POINTS', 'body_too_large', 'parse_json_body',
+           'thread_budget']
@@ -0,0 +1,40 @@
+"""
+二进制编码工具模块
+将数值数组编码为紧凑的二进制文本，供大数据量的 API 响应使用
+"""
+import base64
+import numpy as np
+from typing import Any, Dict, List, Union
+
+
+def pack_floats(values: Union[List[float], np.ndarray]) -> str:
+    """
+    将数值编码为小端 float32 字节序列的 base64 字符串
+    
+    每个值固定占 4 字节（base64 后约 5.3 字符），比 JSON 数字文本更小，
+    且编码无需逐个格式化浮点数。前端可用 Float32Array 直接解码
+    
+    Args:
+        values: 数值列表或 numpy 数组
+        
+    Returns:
+        base64 字符串
+    """
+    return base64.b64encode(np.asarray(values, dtype='<f4').tobytes()).decode('ascii')
+
+
+def encode_values(values: Union[List[float], np.ndarray], binary: bool = False) -> Dict[str, Any]:
+    """
+    生成响应中数值字段
+    
+    Args:
+        values: 数值列表或 numpy 数组
+        binary: 为 True 时返回 base64 编码的 float32 数据，否则返回普通数值数组
+        
+    Returns:
+        binary 为 False 时为 {'values': [...]}；
+        为 True 时为 {'values_b64': '...', 'dtype': 'f32', 'n': 数据点数}
+    """
+    if binary:
+        return {'values_b64': pack_floats(values), 'dtype': 'f32', 'n': len(values)}
+    return {'values': values}
@@ -3,21 +3,18 @@
 提供统一的数据验证和清洗功能，供预处理和检测方法使用
 """
 import numpy as np
-from typing import Tuple, List
+from typing import Tuple, List, Union
 
 
-def clean_data(values: List[float]) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+def to_float_array(values: Union[List[float], np.ndarray]) -> np.ndarray:
     """
-    清洗数据，移除NaN和Inf值
+    将输入转换为新的 float64 数组，无法转换的元素记为 NaN
     
     Args:
-        values: 原始数值列表
+        values: 原始数值列表或 numpy 数组
         
     Returns:
-        Tuple包含:
-        - valid_data: 清洗后的有效数据 (numpy数组)
-        - valid_mask: 有效数据的布尔掩码 (numpy数组)
-        - valid_indices: 有效数据的原始索引列表
+        float64 numpy 数组（总是新数组，可以原地修改）
     """
     # 尝试转换为float数组，处理可能的字符串等类型
     try:
@@ -32,44 +29,148 @@ def clean_data(values: List[float]) -> Tuple[np.ndarray, np.ndarray, List[int]]:
                 converted.append(np.nan)
         data = np.array(converted, dtype=float)
     
+    return data
+
+
+def all_finite(data: np.ndarray) -> bool:
+    """
+    检查数组是否全部为有限值
+    
+    先用求和做一次无额外内存的快速检查：只要有 NaN/Inf，和就不是有限值；
+    和不是有限值时（也可能只是溢出）再逐元素确认
+    
+    Args:
+        data: 浮点 numpy 数组
+        
+    Returns:
+        全部为有限值时返回 True
+    """
+    with np.errstate(over='ignore', invalid='ignore'):
+        if np.isfinite(data.sum()):
+            return True
+    return bool(np.isfinite(data).all())
+
+
+def clean_data(values: Union[List[float], np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    清洗数据，移除NaN和Inf值
+    
+    Args:
+        values: 原始数值列表或 numpy 数组
+        
+    Returns:
+        Tuple包含:
+        - valid_data: 清洗后的有效数据 (numpy数组)
+        - valid_mask: 有效数据的布尔掩码 (numpy数组)
+        - valid_indices: 有效数据的原始索引 (numpy 整数数组，可直接用于索引)
+    """
+    data = to_float_array(values)
+    
     valid_mask = np.isfinite(data)
     valid_data = data[valid_mask]
-    valid_indices = np.where(valid_mask)[0].tolist()
+    # 保持为 numpy 数组，不逐个装箱为 Python int；调用方用它做数组索引也比列表更快
+    valid_indices = np.flatnonzero(valid_mask)
     
     return valid_data, valid_mask, valid_indices
 
 
-def validate_data(values: List[float], min_valid_points: int = 3) -> Tuple[bool, str]:
+def clean_data_inplace(values: Union[List[float], np.ndarray], dtype=np.float64) -> Tuple[np.ndarray, np.ndarray]:
     """
-    验证数据是否满足基本要求
+    清洗数据的轻量版本：只做一次类型转换，并在转换得到的新数组上原地将NaN和Inf置为0
+    
+    与 clean_data 不同，不复制出有效数据、也不构造有效索引列表，
+    需要时由调用方按需通过 data[valid_mask] 或 np.flatnonzero(valid_mask) 获取
     
     Args:
-        values: 数值列表
-        min_valid_points: 最少有效数据点数量（默认3个）
+        values: 原始数值列表或 numpy 数组
+        dtype: 转换的目标类型，默认为 float64
         
     Returns:
         Tuple包含:
-        - is_valid: 数据是否有效
-        - message: 验证失败时的错误信息
+        - data: 完整长度的数组，无效位置为0
+        - valid_mask: 有效数据的布尔掩码 (numpy数组)
     """
-    if not values or len(values) == 0:
-        return False, "数据为空"
-    
-    # 尝试转换为float数组，处理可能的字符串等类型
     try:
-        data = np.array(values, dtype=float)
+        data = np.array(values, dtype=dtype)
     except (ValueError, TypeError):
-        # 如果直接转换失败，逐个元素转换
-        converted = []
-        for v in values:
-            try:
-                converted.append(float(v))
-            except (ValueError, TypeError):
-                converted.append(np.nan)
-        data = np.array(converted, dtype=float)
+        data = to_float_array(values).astype(dtype)
+    
+    valid_mask = np.isfinite(data)
+    if not valid_mask.all():
+        data[~valid_mask] = 0
     
+    return data, valid_mask
+
+
+def analyze(values: Union[List[float], np.ndarray]) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    一次完成类型转换、有效值掩码和数据质量统计
+    
+    routes 层需要同时验证数据和记录质量信息时使用，避免 validate_data 和
+    get_data_quality_info 各自重复转换和检查
+    
+    Args:
+        values: 原始数值列表或 numpy 数组
+        
+    Returns:
+        Tuple包含:
+        - data: float64 numpy 数组（新数组，无效值为 NaN 或 Inf）
+        - valid_mask: 有效数据的布尔掩码 (numpy数组)
+        - quality_info: 数据质量统计字典（同 get_data_quality_info）
+    """
+    data = to_float_array(values)
     valid_mask = np.isfinite(data)
-    valid_count = np.sum(valid_mask)
+    return data, valid_mask, _quality_info(data, valid_mask)
+
+
+def _quality_info(data: np.ndarray, valid_mask: np.ndarray) -> dict:
+    """
+    根据已转换的数据和有效值掩码计算数据质量统计
+    
+    Args:
+        data: float64 numpy 数组
+        valid_mask: 有效数据的布尔掩码
+        
+    Returns:
+        包含数据质量统计的字典
+    """
+    total_count = len(data)
+    valid_count = np.count_nonzero(valid_mask)
+    invalid_count = total_count - valid_count
+    
+    # 无效值只有 NaN 和 Inf 两种：数据全部有效时无需再扫描，
+    # 否则只统计 NaN，Inf 的数量由无效值总数减去 NaN 得到
+    nan_count = np.count_nonzero(np.isnan(data)) if invalid_count > 0 else 0
+    
+    return {
+        'total_points': total_count,
+        'valid_points': int(valid_count),
+        'invalid_points': int(invalid_count),
+        'nan_count': int(nan_count),
+        'inf_count': int(invalid_count - nan_count),
+        'valid_ratio': float(valid_count / total_count) if total_count > 0 else 0.0
+    }
+
+
+def validate_quality(quality_info: dict, min_valid_points: int = 3) -> Tuple[bool, str]:
+    """
+    根据数据质量统计验证数据是否满足基本要求
+    
+    Args:
+        quality_info: 数据质量统计字典（来自 analyze 或 get_data_quality_info）
+        min_valid_points: 最少有效数据点数量（默认3个）
+        
+    Returns:
+        Tuple包含:
+        - is_valid: 数据是否有效
+        - message: 验证失败时的错误信息
+    """
+    total_count = quality_info['total_points']
+    valid_count = quality_info['valid_points']
+    invalid_count = quality_info['invalid_points']
+    
+    if total_count == 0:
+        return False, "数据为空"
     
     if valid_count == 0:
         return False, "所有数据点都是无效值（NaN或Inf）"
@@ -77,26 +178,41 @@ def validate_data(values: List[float], min_valid_points: int = 3) -> Tuple[bool,
     if valid_count < min_valid_points:
         return False, f"有效数据点不足（需要至少{min_valid_points}个，实际{valid_count}个）"
     
-    invalid_count = len(values) - valid_count
     if invalid_count > 0:
-        invalid_ratio = invalid_count / len(values)
+        invalid_ratio = invalid_count / total_count
         if invalid_ratio > 0.5:
-            return False, f"无效数据点过多（{invalid_count}/{len(values)} = {invalid_ratio*100:.1f}%）"
+            return False, f"无效数据点过多（{invalid_count}/{total_count} = {invalid_ratio*100:.1f}%）"
     
     return True, ""
 
 
-def get_data_quality_info(values: List[float]) -> dict:
+def validate_data(values: Union[List[float], np.ndarray], min_valid_points: int = 3) -> Tuple[bool, str]:
+    """
+    验证数据是否满足基本要求
+    
+    Args:
+        values: 数值列表或 numpy 数组
+        min_valid_points: 最少有效数据点数量（默认3个）
+        
+    Returns:
+        Tuple包含:
+        - is_valid: 数据是否有效
+        - message: 验证失败时的错误信息
+    """
+    return validate_quality(get_data_quality_info(values), min_valid_points)
+
+
+def get_data_quality_info(values: Union[List[float], np.ndarray]) -> dict:
     """
     获取数据质量信息
     
     Args:
-        values: 数值列表
+        values: 数值列表或 numpy 数组
         
     Returns:
         包含数据质量统计的字典
     """
-    if not values:
+    if len(values) == 0:
         return {
             'total_points': 0,
             'valid_points': 0,
@@ -106,31 +222,5 @@ def get_data_quality_info(values: List[float]) -> dict:
             'valid_ratio': 0.0
         }
     
-    # 尝试转换为float数组，处理可能的字符串等类型
-    try:
-        data = np.array(values, dtype=float)
-    except (ValueError, TypeError):
-        # 如果直接转换失败，逐个元素转换
-        converted = []
-        for v in values:
-            try:
-                converted.append(float(v))
-            except (ValueError, TypeError):
-                converted.append(np.nan)
-        data = np.array(converted, dtype=float)
-    
-    valid_mask = np.isfinite(data)
-    valid_count = np.sum(valid_mask)
-    invalid_count = len(values) - valid_count
-    
-    nan_count = np.sum(np.isnan(data))
-    inf_count = np.sum(np.isinf(data))
-    
-    return {
-        'total_points': len(values),
-        'valid_points': int(valid_count),
-        'invalid_points': int(invalid_count),
-        'nan_count': int(nan_count),
-        'inf_count': int(inf_count),
-        'valid_ratio': float(valid_count / len(values)) if len(values) > 0 else 0.0
-    }
+    _, _, quality_info = analyze(values)
+    return quality_info
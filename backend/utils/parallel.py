@@ -0,0 +1,30 @@
+"""
+并行计算工具模块
+确定检测算法内部可用的线程数，避免与多进程服务争用 CPU
+"""
+import os
+from typing import Optional
+
+
+def thread_budget(max_threads: Optional[int] = None) -> int:
+    """
+    当前进程内单个请求可用的计算线程数
+    
+    gunicorn 下每个工作进程都可能同时处理请求，CPU 核数按进程数
+    （环境变量 ANOMALY_WORKER_PROCESSES，由 app.run_production_server 设置）平分，
+    进程数不少于核数时只用 1 个线程
+    
+    Args:
+        max_threads: 线程数上限，None 表示不设上限
+    
+    Returns:
+        线程数（至少为 1）
+    """
+    try:
+        processes = max(1, int(os.environ.get('ANOMALY_WORKER_PROCESSES', '1')))
+    except ValueError:
+        processes = 1
+    threads = (os.cpu_count() or 1) // processes
+    if max_threads is not None:
+        threads = min(threads, max_threads)
+    return max(1, threads)
@@ -0,0 +1,48 @@
+"""
+请求体解析工具模块
+在构造 Python 对象和 numpy 数组之前检查请求大小，并用 orjson 解析 JSON 请求体
+"""
+import json
+import orjson
+from typing import Any, Optional
+
+# 请求体大小上限（字节），超过时不读取请求体
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# 单次请求允许的最大数据点数
+MAX_POINTS = 5_000_000
+
+
+def body_too_large(content_length: Optional[int]) -> bool:
+    """
+    根据 Content-Length 判断请求体是否超过大小上限
+    
+    Args:
+        content_length: 请求头中的 Content-Length（没有时为 None）
+    
+    Returns:
+        超过上限时返回 True
+    """
+    return content_length is not None and content_length > MAX_REQUEST_BYTES
+
+
+def parse_json_body(body: bytes) -> Any:
+    """
+    解析 JSON 请求体
+    
+    orjson 直接解析 bytes，比标准库更快；它不接受 NaN/Infinity 等非标准常量，
+    遇到解析失败时退回标准库，与 Flask 的 get_json 行为保持一致
+    
+    Args:
+        body: 原始请求体
+    
+    Returns:
+        解析得到的对象
+    
+    Raises:
+        ValueError: 请求体不是合法的 JSON
+    """
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return json.loads(body)
@@ -412,7 +412,8 @@ export default function DataPreprocessing({
           }))
         };
         
-        const response = await fetch('http://localhost:5555/api/preprocessing/apply-pipeline', {
+        // 时间戳与请求中的相同，不需要后端回传
+        const response = await fetch('http://localhost:5555/api/preprocessing/apply-pipeline?echo_timestamps=false', {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
@@ -423,7 +424,7 @@ export default function DataPreprocessing({
         const result = await response.json();
         
         if (result.success) {
-          setProcessedData(result.data);
+          setProcessedData({ timestamps: detectionData.timestamps, values: result.data.values });
         } else {
           message.error(result.message || '预处理失败');
           setProcessedData(detectionData);
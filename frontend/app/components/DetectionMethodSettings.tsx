@@ -202,7 +202,8 @@ export default function DetectionMethodSettings({
         }
       };
 
-      const response = await fetch('http://localhost:5555/api/detection/detect', {
+      // 时间戳与请求中的相同，不需要后端回传
+      const response = await fetch('http://localhost:5555/api/detection/detect?echo_timestamps=false', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(requestBody),
@@ -211,7 +212,7 @@ export default function DetectionMethodSettings({
       const result = await response.json();
       
       if (result.success) {
-        setDetectionResult(result.data);
+        setDetectionResult({ ...result.data, timestamps: detectionData.timestamps });
         message.success(`检测完成！发现 ${result.data.anomaly_indices.length} 个异常点`);
       } else {
         message.error(result.message || '检测失败');
@@ -49,8 +49,8 @@ fi
 # 激活虚拟环境并启动后端
 source ../venv/bin/activate
 
-# 检查依赖是否已安装
-if ! python -c "import flask" 2>/dev/null; then
+# 检查依赖是否已安装（requirements.txt 中的每个包，新增依赖后已有虚拟环境也会补装）
+if ! python -c "import flask, flask_cors, dotenv, numpy, scipy, pandas, orjson, gunicorn" 2>/dev/null; then
     echo -e "${YELLOW}正在安装后端依赖...${NC}"
     pip install -r requirements.txt
 fi